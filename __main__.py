@@ -1,43 +1,455 @@
 import os
+import re
+import socket
 from dotenv import load_dotenv
-from time import sleep
+from time import sleep, perf_counter
+from queue import Queue, Empty, Full
+from threading import Thread, Event
 from datetime import datetime
 from libs.web_scraping import WebScraping
 from libs.xlsx import SpreadsheetManager
+from libs.parquet import ParquetExporter
+from libs.sinks import XlsxSink, JsonlSink, CsvSink, ParquetSink, MultiSink
+from libs.id_index import IdIndex
+from libs.columns import MAIN_COLUMNS
+from libs.normalized import merge_wide_rows, split_normalized_rows, build_wide_rows
+from libs.manifest import DownloadManifest, HashIndex
+from libs.pdf_text import PdfTextExtractor
+from libs.search_index import SearchIndex
+from libs.watchdog import BrowserWatchdog
+from libs.task_queue import TaskQueue, LeaseRenewer
+from libs.proxies import ProxyPool
+from libs.retry import RetryPolicy, CircuitBreaker
+from libs.progress import StageProgress, log
+from libs.profiler import StageProfiler
+from libs.traffic import TrafficProxy
+from libs.concurrency import AimdController
+from libs.scheduler import PriorityScheduler
 
 # Env variables
 load_dotenv()
 START_PAGE = int(os.getenv("START_PAGE"))
+OUTPUT_SINKS = os.getenv("OUTPUT_SINKS", "xlsx").lower().replace(" ", "").split(",")
+DEDUP_MODE = os.getenv("DEDUP_MODE", "reject").lower().strip()
+DETAILS_LAYOUT = os.getenv("DETAILS_LAYOUT", "wide").lower().strip()
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))
+PARQUET_FLUSH_ROWS = int(os.getenv("PARQUET_FLUSH_ROWS", "10000"))
+PARQUET_FLUSH_INTERVAL = int(os.getenv("PARQUET_FLUSH_INTERVAL", "300"))
+WATCHDOG_TIME_OUT = int(os.getenv("WATCHDOG_TIME_OUT", "600"))
+MAX_RESTARTS = int(os.getenv("MAX_RESTARTS", "3"))
+MAIN_TABLE_WORKERS = int(os.getenv("MAIN_TABLE_WORKERS", "1"))
+INCREMENTAL_STOP_PAGES = int(os.getenv("INCREMENTAL_STOP_PAGES", "0"))
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", "43200"))
+RECYCLE_EVERY = int(os.getenv("RECYCLE_EVERY", "200"))
+RECYCLE_MAX_MEMORY = int(os.getenv("RECYCLE_MAX_MEMORY", "3000"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+PIPELINE_DETAILS_WORKERS = int(os.getenv("PIPELINE_DETAILS_WORKERS", "1"))
+AUTO_CONCURRENCY = os.getenv("AUTO_CONCURRENCY", "false").lower().strip() == "true"
+CONCURRENCY_WINDOW = int(os.getenv("CONCURRENCY_WINDOW", "10"))
+PRIORITY = [key for key in os.getenv("PRIORITY", "").replace(" ", "").split(",") if key]
+PRIORITY_PREFERENCES = {
+    key: [value.strip() for value in os.getenv(f"PRIORITY_{key.upper()}", "").split("|")
+          if value.strip()]
+    for key in PriorityScheduler.text_keys
+}
+TASK_QUEUE_PATH = os.getenv("TASK_QUEUE_PATH", "")
+TASK_LEASE_TIME = int(os.getenv("TASK_LEASE_TIME", "900"))
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+PROXIES = os.getenv("PROXIES", "").replace(" ", "").split(",")
+PROXIES_FILE = os.getenv("PROXIES_FILE", "")
+CHROME_PROFILE_TEMPLATE = os.getenv("CHROME_PROFILE_TEMPLATE", "")
+ACTION_RETRIES = int(os.getenv("ACTION_RETRIES", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "30"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "5"))
+BREAKER_COOL_DOWN = int(os.getenv("BREAKER_COOL_DOWN", "60"))
+PROFILE = os.getenv("PROFILE", "").lower().strip()
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+TRAFFIC_MODE = os.getenv("TRAFFIC_MODE", "").lower().strip()
+TRAFFIC_PORT = int(os.getenv("TRAFFIC_PORT", "8080"))
+MITMDUMP_PATH = os.getenv("MITMDUMP_PATH", "mitmdump")
+SLEEP_SCALE = float(os.getenv("SLEEP_SCALE", "0.1" if TRAFFIC_MODE == "replay" else "1"))
+
+# Paths
+CURRENT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+EXCEL_PATH = os.path.join(CURRENT_FOLDER, os.getenv("EXCEL_FILE", "data.xlsx"))
+PARQUET_FOLDER = os.path.join(CURRENT_FOLDER, "parquet")
+OUTPUT_FOLDER = os.path.join(CURRENT_FOLDER, "output")
+DOWNLOADS_FOLDER = os.path.join(CURRENT_FOLDER, "downloads")
+SEARCH_DB_PATH = os.path.join(CURRENT_FOLDER, "search.db")
+PROFILES_FOLDER = os.path.join(CURRENT_FOLDER, "profiles")
+TRAFFIC_ARCHIVE = os.path.join(CURRENT_FOLDER, os.getenv("TRAFFIC_ARCHIVE", "traffic.flows"))
+
+# Session snapshot (cookies, storage and filters), empty SESSION_FILE to disable
+SESSION_PATH = ""
+if os.getenv("SESSION_FILE", "session.json"):
+    SESSION_PATH = os.path.join(CURRENT_FOLDER, os.getenv("SESSION_FILE", "session.json"))
+
+HOME_PAGE = "https://upcp-compranet.hacienda.gob.mx/sitiopublico/#/"
+SELECTOR_SPINNER = '.spinner:not([style="display: none;"])'
+
+# Search filters of main table
+FILTERS = {
+    "start_month": 1,
+    "start_year": 2023,
+    "end_month": 12,
+    "end_year": 2023,
+    "name": "MEDICAMENTO",
+    "dependency": "IMSS",
+}
+
+# Proxies shared by all the scrapers (one line by proxy in proxies file)
+if PROXIES_FILE:
+    with open(PROXIES_FILE, encoding="utf-8") as proxies_file:
+        PROXIES += proxies_file.read().splitlines()
+PROXY_POOL = ProxyPool(PROXIES)
+
+# Retries of the page actions, paused in all the scrapers when the portal is down
+RETRY_POLICY = RetryPolicy(
+    retries=ACTION_RETRIES,
+    base_delay=RETRY_BASE_DELAY,
+    max_delay=RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(threshold=BREAKER_THRESHOLD, cool_down=BREAKER_COOL_DOWN),
+)
+
+# Profiler of the stages (PROFILE: cprofile, sample or empty to disable)
+PROFILER = StageProfiler(PROFILE, PROFILES_FOLDER, PROFILE_INTERVAL)
+
+# Order of the ids in details and downloads (PRIORITY: date, post_type,
+# caracter, entity or module:function, from the most important)
+SCHEDULER = PriorityScheduler(PRIORITY, PRIORITY_PREFERENCES) if PRIORITY else None
+
+
+def get_priorities(rows: list) -> list:
+    """ Sort keys of main table rows for the task queue
+    
+    Args:
+        rows (list): main table rows
+        
+    Returns:
+        list: sort keys, or None if there is no priority
+    """
+    
+    if not SCHEDULER:
+        return None
+    return [SCHEDULER.get_key(row) for row in rows]
+
+
+# Local proxy that records the portal traffic, or replays it offline
+# (TRAFFIC_MODE: record, replay or empty to disable). Started with the first browser
+TRAFFIC_PROXY = None
+if TRAFFIC_MODE:
+    TRAFFIC_PROXY = TrafficProxy(TRAFFIC_MODE, TRAFFIC_ARCHIVE, TRAFFIC_PORT, MITMDUMP_PATH)
+
+
+def pause(seconds: float):
+    """ Wait between page actions (shorter when replaying recorded traffic)
+    
+    Args:
+        seconds (float): seconds to wait in a live run
+    """
+    
+    sleep(seconds * SLEEP_SCALE)
+
+
+def create_sinks(sink_names: list, sheets: SpreadsheetManager) -> MultiSink:
+    """ Create the outputs where the scraped records will be written
+    
+    Args:
+        sink_names (list): names of the outputs: xlsx, jsonl, csv, parquet
+            or search (full text index)
+        sheets (SpreadsheetManager): excel file used by the xlsx output
+        
+    Returns:
+        MultiSink: sink that writes in all the outputs
+    """
+    
+    # The excel file is read to skip the ids already saved and to resume the
+    # stages, so without it all the ids would be saved again in each run
+    if "xlsx" not in sink_names:
+        raise ValueError("The xlsx output is required in OUTPUT_SINKS")
+    
+    sinks = []
+    for sink_name in sink_names:
+        if sink_name == "xlsx":
+            sinks.append(XlsxSink(sheets))
+        elif sink_name == "jsonl":
+            sinks.append(JsonlSink(OUTPUT_FOLDER))
+        elif sink_name == "csv":
+            sinks.append(CsvSink(OUTPUT_FOLDER))
+        elif sink_name == "parquet":
+            sinks.append(ParquetSink(
+                ParquetExporter(PARQUET_FOLDER),
+                flush_rows=PARQUET_FLUSH_ROWS,
+                flush_interval=PARQUET_FLUSH_INTERVAL,
+            ))
+        elif sink_name == "search":
+            sinks.append(SearchIndex(SEARCH_DB_PATH))
+        else:
+            raise ValueError(f"Invalid output sink: {sink_name}")
+    
+    return MultiSink(sinks)
 
 
 class Scraper(WebScraping):
 
-    def __init__(self):
-        """ Start chrome, load the home page and initialice excel file"""
+    def __init__(self, sheets: SpreadsheetManager = None, sinks: MultiSink = None,
+                 restore_session: bool = True):
+        """ Start chrome, load the home page and initialice excel file
+        
+        Args:
+            sheets (SpreadsheetManager, optional): excel file shared with other
+                scrapers. Defaults to None (open data.xlsx).
+            sinks (MultiSink, optional): outputs shared with other scrapers.
+                Defaults to None (create the OUTPUT_SINKS outputs).
+            restore_session (bool, optional): restore the saved session (the
+                search with filters), only useful in main table scrapers.
+                Defaults to True.
+        """
         
         # Paths
-        current_folder = os.path.dirname(os.path.abspath(__file__))
-        excel_path = os.path.join(current_folder, "data.xlsx")
-        self.downloads_folder = os.path.join(current_folder, "downloads")
+        self.downloads_folder = DOWNLOADS_FOLDER
         os.makedirs(self.downloads_folder, exist_ok=True)
         
         # Start scraper
-        self.home_page = "https://upcp-compranet.hacienda.gob.mx/sitiopublico/#/"
+        self.home_page = HOME_PAGE
+        
+        # Proxy from the pool (if there are proxies), or the traffic proxy
+        if TRAFFIC_PROXY:
+            TRAFFIC_PROXY.start()
+            self.proxy = None
+            proxy = TRAFFIC_PROXY.get_proxy()
+        else:
+            self.proxy = PROXY_POOL.acquire() if len(PROXY_POOL) else None
+            proxy = self.proxy or {}
+        
+        super().__init__(
+            width=1920,
+            height=1080,
+            download_folder=self.downloads_folder,
+            proxy_server=proxy.get("server", ""),
+            proxy_port=proxy.get("port", ""),
+            proxy_user=proxy.get("user", ""),
+            proxy_pass=proxy.get("password", ""),
+            chrome_template=CHROME_PROFILE_TEMPLATE,
+            retry_policy=RETRY_POLICY,
+            ignore_certificates=bool(TRAFFIC_PROXY),
+        )
         
-        super().__init__(width=1920, height=1080, download_folder=self.downloads_folder)
-        self.set_page(self.home_page)
+        # Poll the page faster when the responses are local
+        if TRAFFIC_MODE == "replay":
+            self.basetime = SLEEP_SCALE
         
-        # Start xlsx
+        # Restore the last session saved, or open the home page
+        self.session_data = None
+        if SESSION_PATH and restore_session:
+            self.session_data = self.load_session(SESSION_PATH, SESSION_MAX_AGE)
+        if not self.session_data:
+            self.set_page(self.home_page)
+        
+        # Kill the browser when it hangs
+        self.watchdog = BrowserWatchdog(self, time_out=WATCHDOG_TIME_OUT)
+        self.watchdog.start()
+        
+        # Ids processed with the current browser
+        self.browser_ids = 0
+        
+        # Progress bars shared with other scrapers, by stage
+        self.progress = {}
+        
+        # Workers limit shared with other scrapers (optional), and errors
+        # (restarts and spinner time outs) used to tune it
+        self.concurrency = None
+        self.errors = 0
+        
+        # Tasks shared with other scrapers (optional)
+        self.task_queue = None
+        if TASK_QUEUE_PATH:
+            self.task_queue = TaskQueue(TASK_QUEUE_PATH, lease_time=TASK_LEASE_TIME)
+        
+        # Start xlsx and outputs
         self.sheet_main_name = "main_table"
         self.sheet_details_name = "details_table"
-        self.sheets = SpreadsheetManager(file_name=excel_path)
+        self.sheet_procedures_name = "procedures_table"
+        self.sheet_contracts_name = "contracts_table"
+        self.sheet_requirements_name = "requirements_table"
+        self.sheets = sheets or SpreadsheetManager(file_name=EXCEL_PATH)
+        self.sinks = sinks or create_sinks(OUTPUT_SINKS, self.sheets)
+        
+        # Index of the ids already saved in main table
+        self.data_start_row = 3
+        self.main_index = IdIndex(start_row=self.data_start_row)
+        self.main_index.load(self.__read_sheet__(self.sheet_main_name))
+        
+    def close(self):
+        """ Stop the watchdog, release the proxy and close the browser
+        (removing its copy of the chrome profile template)
+        """
+        
+        self.watchdog.stop()
+        if self.proxy:
+            PROXY_POOL.release(self.proxy)
+            self.proxy = None
+        try:
+            self.end_browser()
+        except Exception as error:
+            log(f"\tError closing browser: {error}")
+        
+    def __read_sheet__(self, sheet_name: str, start_row: int = 3) -> list:
+        """ Read the rows of a sheet, locking the outputs (shared with other
+        scrapers) while it is read
+        
+        Args:
+            sheet_name (str): name of the sheet
+            start_row (int, optional): first row to read. Defaults to 3.
+            
+        Returns:
+            list: rows of the sheet
+        """
+        
+        with self.sinks.lock:
+            self.sheets.create_set_sheet(sheet_name)
+            return self.sheets.get_data(start_row)
+    
+    def __get_main_rows__(self) -> list:
+        """ Read the rows saved in main table, in saved order, skipping
+        empty rows and repeated ids
+        
+        Returns:
+            list: main table rows
+        """
+        
+        data = self.__read_sheet__(self.sheet_main_name)
+        
+        main_data = []
+        for row_num, row in enumerate(data, start=self.data_start_row):
+            if row[0] and self.main_index.get_row(row[0]) == row_num:
+                main_data.append(tuple(row))
+        
+        return main_data
+    
+    def __save_main_rows__(self, data: list) -> list:
+        """ Save rows in main table, skipping (or updating, in upsert mode)
+        the ids already saved
+        
+        Args:
+            data (list): rows extracted from main table
+            
+        Returns:
+            list: new rows saved
+        """
+        
+        new_rows, known_rows = self.main_index.split(data)
         
+        # Append new ids
+        if new_rows:
+            start_row = self.main_index.next_row
+            for row in new_rows:
+                self.main_index.add(row[0])
+            self.sinks.write(self.sheet_main_name, new_rows, start_row)
+        
+        # Overwrite already saved ids, in a single save (only in the outputs
+        # that can update rows, to keep the ids unique in the other ones)
+        if DEDUP_MODE == "upsert" and known_rows:
+            row_nums = [self.main_index.get_row(row[0]) for row in known_rows]
+            self.sinks.update(self.sheet_main_name, known_rows, row_nums)
+        
+        return new_rows
+        
+    def __get_progress__(self, stage: str, total: int = None, initial: int = 0,
+                         unit: str = "id") -> tuple:
+        """ Get the progress bar of a stage shared with other scrapers,
+        or create a new one
+        
+        Args:
+            stage (str): name of the stage
+            total (int, optional): items to process. Defaults to None (unknown).
+            initial (int, optional): items already processed. Defaults to 0.
+            unit (str, optional): name of the items. Defaults to "id".
+            
+        Returns:
+            tuple: (progress bar, True if it was created and must be closed)
+        """
+        
+        if stage in self.progress:
+            return self.progress[stage], False
+        return StageProgress(stage, total=total, initial=initial, unit=unit), True
+    
     def __wait_spinner__(self):
         """ Wait until page loads, checking the spinner """
         
-        selector_spinner = '.spinner:not([style="display: none;"])'
-        self.wait_die(selector_spinner, time_out=300)
+        self.heartbeat()
+        try:
+            self.wait_die(SELECTOR_SPINNER, time_out=300)
+        except Exception:
+            self.errors += 1
+            raise
         self.refresh_selenium()
+        self.heartbeat()
+    
+    def __check_recycle__(self):
+        """ Recycle the browser (to release its memory) each RECYCLE_EVERY ids
+        or when it uses more than RECYCLE_MAX_MEMORY MB
+        """
+        
+        memory = self.get_memory_usage()
+        if self.browser_ids < RECYCLE_EVERY and memory < RECYCLE_MAX_MEMORY:
+            return
+        
+        log(f"\t\tRecycling browser ({self.browser_ids} ids, {memory:.0f} MB)...")
+        try:
+            self.recycle_browser()
+        except Exception:
+            self.restart_browser()
+        self.browser_ids = 0
+    
+    def __rotate_proxy__(self):
+        """ Penalize the current proxy and change to other proxy of the pool
+        (used the next time the browser starts)
+        """
+        
+        self.proxy = PROXY_POOL.rotate(self.proxy)
+        self.set_proxy(
+            self.proxy["server"],
+            self.proxy["port"],
+            self.proxy["user"],
+            self.proxy["password"],
+        )
+    
+    def __process_id__(self, id: str, process_function):
+        """ Process an id, restarting the browser and retrying the id
+        when the browser crashes, hangs or the page doesn't load
+        
+        Args:
+            id (str): procedure id
+            process_function (function): function (without arguments) that
+                process the id
+            
+        Returns:
+            any: value returned by the process function
+        """
+        
+        self.__check_recycle__()
+        self.browser_ids += 1
+        
+        for restart in range(MAX_RESTARTS + 1):
+            self.heartbeat()
+            try:
+                result = process_function()
+                if self.proxy:
+                    PROXY_POOL.report(self.proxy, True)
+                return result
+            except Exception as error:
+                self.errors += 1
+                if self.proxy:
+                    self.__rotate_proxy__()
+                if restart == MAX_RESTARTS:
+                    raise
+                
+                log(f"\t\tError processing {id}: {error}")
+                log(f"\t\tRestarting browser ({restart + 1}/{MAX_RESTARTS})...")
+                self.restart_browser()
+                self.browser_ids = 0
         
     def __set_date__(self, month: int, year: int, selector_calendar: str,
                      selector_back: str, selector_day: str):
@@ -65,7 +477,7 @@ class Scraper(WebScraping):
         self.refresh_selenium()
         for _ in range(months):
             self.click_js(selector_back)
-            sleep(0.3)
+            pause(0.3)
             
         # Select day
         self.click_js(selector_day)
@@ -90,6 +502,137 @@ class Scraper(WebScraping):
         
         return True
     
+    def __get_main_pages_num__(self) -> int:
+        """ Read the number of pages of the main table (going to the last
+        page and back to the first one)
+        
+        Returns:
+            int: pages number
+        """
+        
+        selectors = {
+            "last_btn": '.p-paginator-last',
+            "first_btn": '.p-paginator-first',
+            "current_page": '.p-paginator-page.p-highlight',
+        }
+        
+        self.click_js(selectors["last_btn"])
+        self.__wait_spinner__()
+        pages_num = self.get_text(selectors["current_page"]).strip()
+        pages_num = int(pages_num) if pages_num.isdigit() else 1
+        
+        self.click_js(selectors["first_btn"])
+        self.__wait_spinner__()
+        
+        return pages_num
+    
+    def __get_main_pages_report__(self, rows_per_page: int) -> int:
+        """ Estimate the number of pages of the main table from the rows total
+        in the paginator report (like "1 - 100 de 2345 registros"), without
+        change the page. Used only to size the progress bar
+        
+        Args:
+            rows_per_page (int): rows per page selected (0 if unknown)
+            
+        Returns:
+            int: pages number, or 0 if the report has no rows total
+        """
+        
+        selector_report = '.p-paginator .p-paginator-current'
+        
+        if not rows_per_page or not self.get_elems(selector_report):
+            return 0
+        
+        # Only an explicit rows total (other templates show pages, not rows)
+        report = self.get_text(selector_report).replace(",", "")
+        match = re.search(r"de\s+(\d+)\s+registros", report, re.IGNORECASE)
+        if not match:
+            return 0
+        return -(-int(match.group(1)) // rows_per_page)
+    
+    def __go_to_page_main_table__(self, page: int, pages_num: int = 0):
+        """ Move to a page of the main table, jumping with the page links
+        of the paginator (faster than the next button), from the first or
+        from the last page (the nearest one)
+        
+        Args:
+            page (int): page number
+            pages_num (int, optional): pages number of the table.
+                Defaults to 0 (unknown: move from the current page).
+        """
+        
+        selectors = {
+            "current_page": '.p-paginator-page.p-highlight',
+            "page_link": '.p-paginator-pages .p-paginator-page',
+            "last_btn": '.p-paginator-last',
+        }
+        
+        # Pages in the second half: go to the last page and walk back
+        if pages_num and page > pages_num / 2 + 1:
+            self.click_js(selectors["last_btn"])
+            self.__wait_spinner__()
+        
+        for _ in range(max(page, pages_num)):
+            current_page = self.get_text(selectors["current_page"]).strip()
+            current_page = int(current_page) if current_page.isdigit() else 1
+            if current_page == page:
+                return
+            
+            # Click the page, or the closest visible page link
+            links = {}
+            for link in self.get_elems(selectors["page_link"]):
+                if link.text.strip().isdigit():
+                    links[int(link.text.strip())] = link
+            if page in links:
+                target_page = page
+            elif page > current_page:
+                target_page = max(links, default=current_page)
+            else:
+                target_page = min(links, default=current_page)
+            
+            if target_page == current_page:
+                self.__go_next_page_main_table__()
+            else:
+                self.driver.execute_script("arguments[0].click();", links[target_page])
+                self.__wait_spinner__()
+        
+        raise Exception(f"Page {page} of main table not reached")
+    
+    def __set_max_rows_per_page__(self) -> int:
+        """ Select the largest rows per page option of the main table
+        paginator, to load the table in less pages
+        
+        Returns:
+            int: rows per page selected, or 0 if the paginator has no options
+        """
+        
+        selectors = {
+            "dropdown": '.p-paginator .p-dropdown',
+            "option": '.p-dropdown-items .p-dropdown-item',
+        }
+        
+        if not self.get_elems(selectors["dropdown"]):
+            return 0
+        
+        # Open options and find the largest one
+        self.click_js(selectors["dropdown"])
+        self.refresh_selenium()
+        options = self.get_elems(selectors["option"])
+        sizes = []
+        for option in options:
+            text = option.text.strip()
+            sizes.append(int(text) if text.isdigit() else 0)
+        if not sizes or max(sizes) == 0:
+            return 0
+        
+        # Select it and wait to reload the table
+        rows_per_page = max(sizes)
+        option = options[sizes.index(rows_per_page)]
+        self.driver.execute_script("arguments[0].click();", option)
+        self.__wait_spinner__()
+        
+        return rows_per_page
+    
     def __extract_table__(self, selectors: dict) -> list:
         """ Extract data from table
         
@@ -100,26 +643,47 @@ class Scraper(WebScraping):
             list: data extracted
         """
         
-        # Get rows num
-        rows_num = len(self.get_elems(selectors["row"]))
+        # Skip no required selectors
+        cells_selectors = [
+            selector_value for selector_name, selector_value in selectors.items()
+            if selector_name not in ["row"]
+        ]
+        
+        # Extract each required value for each row, in a single js call
+        script = """
+            const [rowSelector, cellsSelectors] = arguments
+            const rowsNum = document.querySelectorAll(rowSelector).length
+            const data = []
+            for (let rowIndex = 1; rowIndex <= rowsNum; rowIndex++) {
+                data.push(cellsSelectors.map(selector => {
+                    const elem = document.querySelector(
+                        selector.replaceAll("index", rowIndex)
+                    )
+                    return elem ? elem.innerText.trim() : ""
+                }))
+            }
+            return data
+        """
+        data = self.driver.execute_script(script, selectors["row"], cells_selectors)
+        return data
+    
+    def __extract_paginated_table__(self, selectors: dict, selector_next: str) -> list:
+        """ Extract data from all the pages of a table
         
-        # Extract each required value for each row
-        data = []
-        for row_index in range(1, rows_num + 1):
-            row_data = []
-            for selector_name, selector_value in selectors.items():
-                
-                # Skip no required selectors
-                if selector_name in ["row"]:
-                    continue
-                
-                # Extract text
-                selector = selector_value.replace("index", f"{row_index}")
-                value = self.get_text(selector)
-                row_data.append(value)
-                    
-            data.append(row_data)
+        Args:
+            selectors (dict): selectors for the table
+            selector_next (str): selector of the enabled next page button
             
+        Returns:
+            list: data extracted from all pages
+        """
+        
+        data = self.__extract_table__(selectors)
+        while self.get_elems(selector_next):
+            self.click_js(selector_next)
+            self.__wait_spinner__()
+            data += self.__extract_table__(selectors)
+        
         return data
     
     def __extract_main_current_page__(self) -> list:
@@ -140,6 +704,35 @@ class Scraper(WebScraping):
         }
         
         return self.__extract_table__(selectors)
+    
+    def __extract_main_page_checked__(self, rows_per_page: int) -> list:
+        """ Extract the current page of the main table, retrying when a page
+        (that is not the last one) has less rows than the page size
+        
+        Args:
+            rows_per_page (int): rows per page selected (0 if unknown)
+            
+        Returns:
+            list: data extracted from the main current page
+        """
+        
+        selector_last_page = '.p-paginator-next.p-disabled'
+        
+        for _ in range(3):
+            data = self.__extract_main_current_page__()
+            
+            # Only the last page can be incomplete
+            if not rows_per_page or len(data) == rows_per_page:
+                return data
+            if self.get_elems(selector_last_page) and len(data) < rows_per_page:
+                return data
+            
+            log(f"\t\t{len(data)} rows of {rows_per_page} found. Retrying...")
+            self.__wait_spinner__()
+            pause(3)
+        
+        log(f"\t\tWarning: page with {len(data)} rows of {rows_per_page}")
+        return data
         
     def __search_id__(self, id: str):
         """ Search a specific id in the main table
@@ -193,8 +786,10 @@ class Scraper(WebScraping):
             "taxes": '[key="detalleDRC"] + br + [class="p-grid"]'
                      ' tr:nth-child(index) td:nth-child(8)',
         }
+        selector_next = ('[key="detalleDRC"] + br + [class="p-grid"]'
+                         ' .p-paginator-next:not(.p-disabled)')
         
-        data = self.__extract_table__(selectors)
+        data = self.__extract_paginated_table__(selectors, selector_next)
         return data
     
     def __extract_requirements__(self) -> str:
@@ -220,15 +815,22 @@ class Scraper(WebScraping):
             "details": '[class="p-fluid p-formgrid p-grid"] > div:last-child'
                        ' tr:nth-child(index) td:nth-child(5)',
         }
+        selector_next = ('[class="p-fluid p-formgrid p-grid"] > div:last-child'
+                         ' .p-paginator-next:not(.p-disabled)')
         
-        data = self.__extract_table__(selectors)
+        data = self.__extract_paginated_table__(selectors, selector_next)
         return data
     
-    def __download_files_page__(self, id: str):
-        """ Download files from current page
+    def __download_files_page__(self, id: str, manifest: DownloadManifest) -> bool:
+        """ Download files from current page, skipping the files already
+        downloaded in the manifest
         
         Args:
             id (str): id to search
+            manifest (DownloadManifest): manifest of the id files
+            
+        Returns:
+            bool: True if there is a next page, False otherwise
         """
         
         selectors = {
@@ -262,36 +864,51 @@ class Scraper(WebScraping):
             file_name = f"{id} - {num} - {type}.{file_ext}"
             moved_file_path = os.path.join(id_folder, file_name)
             
+            # Skip files already downloaded
+            if manifest.is_downloaded(file_name):
+                log(f"\t\tFile {num} - {type} already downloaded. Skipping...")
+                continue
+            
             # Try to downbload file 3 times
             downloaded = False
             for _ in range(3):
+                self.heartbeat()
             
                 # Download file and wait to finish
                 self.click(selectors["download_btn"].replace("index", str(row_index)))
                 self.__wait_spinner__()
-                sleep(15)
+                pause(15)
 
                 # Detect new file
                 new_files = os.listdir(self.downloads_folder)
                 new_files = list(filter(lambda file: file.endswith(".pdf"), new_files))
                 new_files = list(set(new_files) - set(old_files))
                 if not new_files:
-                    print(f"\t\tFile {num} - {type} not downloaded. Retrying...")
+                    log(f"\t\tFile {num} - {type} not downloaded. Retrying...")
                     continue
                 
                 downloaded = True
                 break
             
             if not downloaded:
-                print(f"\t\tFile {num} - {type} not downloaded")
+                log(f"\t\tFile {num} - {type} not downloaded")
+                manifest.add_file(num, type, file_name, "failed")
+                manifest.save()
                 continue
             
             new_file_path = os.path.join(self.downloads_folder, new_files[0])
             
             # Move file to id folder
-            os.rename(new_file_path, moved_file_path)
+            os.replace(new_file_path, moved_file_path)
             
-            print(f"\t\tFile {num} - {type} downloaded")
+            # Save file in manifest, and link it if the content is already saved
+            manifest.add_file(num, type, file_name, "done")
+            manifest.save()
+            sha256 = manifest.get_files()[file_name]["sha256"]
+            if self.hash_index.link_duplicate(moved_file_path, sha256):
+                log(f"\t\tFile {num} - {type} downloaded (duplicated content linked)")
+            else:
+                log(f"\t\tFile {num} - {type} downloaded")
         
         # Validate and go to next page
         if self.get_elems(selectors["next_btn"]):
@@ -322,14 +939,19 @@ class Scraper(WebScraping):
         # Wait until page loads
         self.__wait_spinner__()
         
+        # Skip the filters when the restored session already has the results
+        if self.__is_search_restored__():
+            log("\tSearch restored from saved session")
+            return
+        
         # Display all filters
         self.click_js(self.selectors["show_filters"])
         self.refresh_selenium()
         
         # Set start date
         self.__set_date__(
-            month=1,
-            year=2023,
+            month=FILTERS["start_month"],
+            year=FILTERS["start_year"],
             selector_calendar=self.selectors["date_from_calendar"],
             selector_back=self.selectors["date_back"],
             selector_day=self.selectors["date_from_day"]
@@ -337,20 +959,20 @@ class Scraper(WebScraping):
         
         # Set end date
         self.__set_date__(
-            month=12,
-            year=2023,
+            month=FILTERS["end_month"],
+            year=FILTERS["end_year"],
             selector_calendar=self.selectors["date_to_calendar"],
             selector_back=self.selectors["date_back"],
             selector_day=self.selectors["date_to_day"]
         )
         
         # Set search name
-        self.send_data(self.selectors["name"], "MEDICAMENTO")
+        self.send_data(self.selectors["name"], FILTERS["name"])
         
         # Set dependency
         self.click_js(self.selectors["dependency_display"])
         self.refresh_selenium()
-        self.send_data(self.selectors["dependency_search"], "IMSS")
+        self.send_data(self.selectors["dependency_search"], FILTERS["dependency"])
         self.refresh_selenium()
         self.click_js(self.selectors["dependency_checkbox"])
         
@@ -360,46 +982,422 @@ class Scraper(WebScraping):
         
         self.click_js(self.selectors["tab"])
         self.__wait_spinner__()
+        
+        # Save the session, to restore the search in other browsers
+        if SESSION_PATH:
+            self.save_session(SESSION_PATH, {"filters": FILTERS})
     
-    def extract_main_table(self):
-        """ Get general data from main table"""
+    def __is_search_restored__(self) -> bool:
+        """ Check if the session restored on start has the search results
+        of the current filters, reading the filters applied in the page (the
+        url and storage don't restore the form, so the page can show other
+        results)
         
-        print("Extracting main table...")
+        Returns:
+            bool: True if the results table is loaded with the current filters
+        """
         
-        # Set main table in excel
-        self.sheets.create_set_sheet(self.sheet_main_name)
+        selectors = {
+            "results": '.p-datatable-unfrozen-view td',
+            "name": 'input[name="nombreProcedimiento"]',
+            "date_from": '[name="fechaDesdeP"] input',
+            "date_to": '[name="fechaHastaP"] input',
+            "dependency": '[name="dependencias"] .p-multiselect-label',
+        }
+        
+        if not self.session_data or self.session_data.get("filters") != FILTERS:
+            return False
+        if not self.get_elems(selectors["results"]):
+            return False
+        
+        # Values of the filters in the page (null if the element is not found)
+        script = """
+            const [selectors] = arguments
+            const values = {}
+            for (const [name, selector] of Object.entries(selectors)) {
+                const elem = document.querySelector(selector)
+                if (!elem) {
+                    values[name] = null
+                } else {
+                    values[name] = ("value" in elem ? elem.value : elem.innerText).trim()
+                }
+            }
+            return values
+        """
+        values = self.driver.execute_script(script, selectors)
+        
+        def is_date(value: str, month: int, year: int) -> bool:
+            match = re.search(r"(\d{1,2})/(\d{1,2})/(\d{4})", value or "")
+            if not match:
+                return False
+            return (int(match.group(2)), int(match.group(3))) == (month, year)
+        
+        return (
+            (values["name"] or "").upper() == FILTERS["name"].upper()
+            and FILTERS["dependency"].upper() in (values["dependency"] or "").upper()
+            and is_date(values["date_from"], FILTERS["start_month"], FILTERS["start_year"])
+            and is_date(values["date_to"], FILTERS["end_month"], FILTERS["end_year"])
+        )
+    
+    def extract_main_table(self, ids_queues: list = []):
+        """ Get general data from main table
+        
+        Args:
+            ids_queues (list, optional): queues where the new rows are sent,
+                to be processed by other scrapers. Defaults to [].
+        """
+        
+        log("Extracting main table...")
+        
+        # Load the table in less pages (START_PAGE counts pages of this size)
+        rows_per_page = self.__set_max_rows_per_page__()
+        if rows_per_page:
+            log(f"\t{rows_per_page} rows per page")
+        
+        # Pages to extract, for the progress bar (unknown if the paginator
+        # has no report, to don't load the last page only to count them)
+        pages_num = self.__get_main_pages_report__(rows_per_page)
+        total = max(pages_num - START_PAGE + 1, 0) if pages_num else None
+        progress, own_progress = self.__get_progress__(
+            "main_table", total=total, unit="page"
+        )
         
         # Move to start page
         for _ in range(START_PAGE - 1):
             self.__go_next_page_main_table__()
         
-        current_row = 3 + (START_PAGE - 1) * 100
+        # Rows counters, to validate that all rows are saved in order
+        first_row = self.main_index.next_row
+        rows_found = 0
+        rows_new = 0
+        
         page = START_PAGE
+        known_pages = 0
         while True:
             
-            print(f"\tExtracting page {page} from main table...")
-            
-            # Extract data
-            data = self.__extract_main_current_page__()
+            log(f"\tExtracting page {page} from main table...")
+            start_time = perf_counter()
             
-            # Save data in excel
-            self.sheets.write_data(data, current_row)
-            self.sheets.save()
-            current_row += len(data)
+            # Extract and save data
+            data = self.__extract_main_page_checked__(rows_per_page)
+            new_rows = self.__save_main_page__(data, ids_queues)
+            rows_found += len(data)
+            rows_new += len(new_rows)
             page += 1
+            progress.update(records=len(data), latency=perf_counter() - start_time)
+            
+            # Incremental crawl: stop when the pages have only known ids
+            known_pages = known_pages + 1 if data and not new_rows else 0
+            if self.__is_crawl_updated__(known_pages):
+                break
             
             # Move to next page
             more_pages = self.__go_next_page_main_table__()
             if not more_pages:
                 break
+        
+        if own_progress:
+            progress.close()
+        self.__check_saved_rows__(first_row, rows_found, rows_new)
+    
+    def __save_main_page__(self, data: list, ids_queues: list,
+                           browser_thread: Thread = None) -> list:
+        """ Save the rows of a main table page (new ids only, in the rows
+        after the saved ones) and send the new rows to the next stages
+        
+        Args:
+            data (list): rows extracted from a main table page
+            ids_queues (list): queues where the new rows are sent
+            browser_thread (Thread, optional): other thread that uses this
+                browser while the rows are sent. Defaults to None.
             
-    def extract_details(self):
-        """ Extract details from each id in the excel """
+        Returns:
+            list: new rows saved
+        """
+        
+        start_row = self.main_index.next_row
+        new_rows = self.__save_main_rows__(data)
+        log(f"\t\t{len(new_rows)} new rows (rows {start_row} to"
+            f" {self.main_index.next_row - 1})")
+        
+        # Send new rows to the next stages (waits if they are full)
+        for ids_queue in ids_queues:
+            for row in new_rows:
+                self.__put_row__(ids_queue, row, browser_thread)
+        
+        # Add the new rows to the progress of the next stages
+        if ids_queues:
+            for stage in ["details", "downloads"]:
+                if stage in self.progress:
+                    self.progress[stage].add_total(len(new_rows))
+        
+        # Share new rows with the scrapers of other nodes
+        if self.task_queue:
+            for stage in ["details", "downloads"]:
+                self.task_queue.add_tasks(stage, new_rows, get_priorities(new_rows))
+        
+        return new_rows
+    
+    def __put_row__(self, ids_queue: Queue, row: list, browser_thread: Thread = None):
+        """ Send a row to the queue of a next stage, waiting while it is full.
+        The browser is not watched while waiting, unless other thread uses it
+        
+        Args:
+            ids_queue (Queue): queue of the next stage
+            row (list): main table row
+            browser_thread (Thread, optional): other thread that uses this
+                browser. Defaults to None.
+        """
+        
+        while browser_thread and browser_thread.is_alive():
+            try:
+                ids_queue.put(tuple(row), timeout=10)
+                return
+            except Full:
+                continue
+        
+        with self.watchdog.idle():
+            ids_queue.put(tuple(row))
+        self.heartbeat()
+    
+    def __is_crawl_updated__(self, known_pages: int) -> bool:
+        """ Check if the main table extraction can stop, because the last
+        pages (sorted from newest) only have ids already saved
+        
+        Args:
+            known_pages (int): pages in a row without new ids
+            
+        Returns:
+            bool: True if there are INCREMENTAL_STOP_PAGES known pages in a row
+        """
+        
+        if INCREMENTAL_STOP_PAGES and known_pages >= INCREMENTAL_STOP_PAGES:
+            log(f"\t{known_pages} pages in a row without new ids. Stopping...")
+            return True
+        return False
+    
+    def __check_saved_rows__(self, first_row: int, rows_found: int, rows_new: int):
+        """ Print the rows summary of a main table extraction, validating
+        that all the new rows were written in the main table sheet
+        
+        Args:
+            first_row (int): first free row before the extraction
+            rows_found (int): rows extracted from the pages
+            rows_new (int): new rows returned by the saves
+        """
+        
+        # Rows with id in the sheet after the rows saved before the extraction
+        data = self.__read_sheet__(self.sheet_main_name, start_row=first_row)
+        rows_saved = len([row for row in data if row and row[0]])
+        log(f"\t{rows_found} rows found, {rows_new} new, {rows_saved} rows saved")
+        if rows_saved != rows_new:
+            log("\tWarning: saved rows don't match the new rows")
+    
+    def extract_main_pages(self, first_page: int, last_page: int, rows_per_page: int,
+                           results_queue: Queue, apply_filters: bool = True,
+                           stop_event: Event = None, pages_num: int = 0):
+        """ Extract a range of pages of the main table (a shard of the search),
+        sending the data of each page to the results queue. A (None, None)
+        item is sent at the end
+        
+        Args:
+            first_page (int): first page of the range
+            last_page (int): last page of the range
+            rows_per_page (int): rows per page selected (0 if unknown)
+            results_queue (Queue): queue where (page, data) items are sent
+            apply_filters (bool, optional): apply the filters and page size
+                before start. Defaults to True.
+            stop_event (Event, optional): event set to stop the extraction
+                (incremental crawl up to date). Defaults to None.
+            pages_num (int, optional): pages number of the table, to move to
+                the first page from the nearest end. Defaults to 0 (unknown).
+        """
+        
+        try:
+            if apply_filters:
+                self.apply_filters()
+                self.__set_max_rows_per_page__()
+            self.__go_to_page_main_table__(first_page, pages_num)
+            
+            for page in range(first_page, last_page + 1):
+                if stop_event and stop_event.is_set():
+                    break
+                
+                log(f"\tExtracting page {page} from main table...")
+                data = self.__extract_main_page_checked__(rows_per_page)
+                results_queue.put((page, data))
+                
+                if page < last_page and not self.__go_next_page_main_table__():
+                    break
+        except Exception as error:
+            log(f"\tError extracting pages {first_page} to {last_page}: {error}")
+        finally:
+            results_queue.put((None, None))
+    
+    def extract_main_table_sharded(self, workers_num: int, ids_queues: list = []):
+        """ Get general data from main table, splitting the pages of the search
+        between many browsers. Pages are saved in page order
+        
+        Args:
+            workers_num (int): number of browsers (this one included)
+            ids_queues (list, optional): queues where the new rows are sent,
+                to be processed by other scrapers. Defaults to [].
+        """
+        
+        log("Extracting main table...")
+        
+        # Read pages num once, with the same page size of the workers (from
+        # the last page, not from the report, to don't drop pages)
+        rows_per_page = self.__set_max_rows_per_page__()
+        pages_num = self.__get_main_pages_num__()
+        log(f"\t{pages_num} pages of {rows_per_page} rows")
+        
+        # Split pages in contiguous ranges
+        pages = list(range(START_PAGE, pages_num + 1))
+        shard_size = max(-(-len(pages) // workers_num), 1)
+        ranges = [
+            (pages[start], pages[min(start + shard_size, len(pages)) - 1])
+            for start in range(0, len(pages), shard_size)
+        ]
+        
+        # Start workers (this scraper extracts the first range)
+        results_queue = Queue()
+        stop_event = Event()
+        workers = []
+        threads = []
+        for index, (first_page, last_page) in enumerate(ranges):
+            log(f"\tWorker {index + 1}: pages {first_page} to {last_page}")
+            if index == 0:
+                scraper = self
+            else:
+                scraper = Scraper(self.sheets, self.sinks)
+                workers.append(scraper)
+            threads.append(Thread(
+                target=scraper.extract_main_pages,
+                args=(first_page, last_page, rows_per_page, results_queue, index > 0,
+                      stop_event, pages_num)
+            ))
+        for thread in threads:
+            thread.start()
+        
+        try:
+            self.__save_sharded_pages__(
+                pages, threads, results_queue, stop_event, ids_queues
+            )
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+            for scraper in workers:
+                scraper.close()
+    
+    def __save_sharded_pages__(self, pages: list, threads: list, results_queue: Queue,
+                               stop_event: Event, ids_queues: list):
+        """ Save the pages sent by the main table workers in page order,
+        as they arrive
+        
+        Args:
+            pages (list): page numbers to extract
+            threads (list): threads of the workers (the first one is this scraper)
+            results_queue (Queue): queue where the workers send (page, data) items
+            stop_event (Event): event set to stop the workers
+            ids_queues (list): queues where the new rows are sent
+        """
+        
+        # Save pages in page order, as they arrive
+        progress, own_progress = self.__get_progress__(
+            "main_table", total=len(pages), unit="page"
+        )
+        first_row = self.main_index.next_row
+        rows_found = 0
+        rows_new = 0
+        pending_pages = {}
+        next_page = START_PAGE
+        known_pages = 0
+        running = len(threads)
+        while running:
+            
+            # Watch this browser only while it extracts its own range
+            if threads[0].is_alive():
+                try:
+                    page, data = results_queue.get(timeout=10)
+                except Empty:
+                    continue
+            else:
+                with self.watchdog.idle():
+                    page, data = results_queue.get()
+            if page is None:
+                running -= 1
+                continue
+            
+            # Skip the pages extracted after the incremental stop
+            if stop_event.is_set():
+                continue
+            
+            pending_pages[page] = data
+            while next_page in pending_pages and not stop_event.is_set():
+                log(f"\tSaving page {next_page} of main table...")
+                data = pending_pages.pop(next_page)
+                new_rows = self.__save_main_page__(data, ids_queues, threads[0])
+                rows_found += len(data)
+                rows_new += len(new_rows)
+                next_page += 1
+                progress.update(records=len(data))
+                
+                # Incremental crawl: stop all workers when pages have only known ids
+                known_pages = known_pages + 1 if data and not new_rows else 0
+                if self.__is_crawl_updated__(known_pages):
+                    stop_event.set()
+        
+        if stop_event.is_set():
+            pending_pages = {}
+        
+        # Save the pages after the missing ones (from failed workers)
+        if pending_pages:
+            missing_pages = [page for page in pages
+                             if page >= next_page and page not in pending_pages]
+            log(f"\tWarning: pages not extracted: {missing_pages}")
+        for page in sorted(pending_pages):
+            log(f"\tSaving page {page} of main table...")
+            data = pending_pages[page]
+            new_rows = self.__save_main_page__(data, ids_queues, threads[0])
+            rows_found += len(data)
+            rows_new += len(new_rows)
+            progress.update(records=len(data))
+        
+        if own_progress:
+            progress.close()
+        
+        self.__check_saved_rows__(first_row, rows_found, rows_new)
+            
+    def __open_details__(self, id: str):
+        """ Search an id and open its details page
         
-        print("Extracting details tables...")
+        Args:
+            id (str): id to search
+        """
         
         selectors = {
             "id": 'tr:nth-child(1) > td:nth-child(2)',
+        }
+        
+        self.__search_id__(id)
+        self.__wait_spinner__()
+        
+        # Open details
+        self.click_js(selectors["id"])
+        self.__wait_spinner__()
+        pause(8)
+        self.refresh_selenium()
+    
+    def __extract_details_page__(self) -> tuple:
+        """ Extract general data and internal tables from the current details page
+        
+        Returns:
+            tuple: (general data, contracts, requirements)
+        """
+        
+        selectors = {
             "dependency": 'app-sitiopublico-detalle-datos-ente-pc'
                           ' > div label:nth-child(3)',
             "branch": 'app-sitiopublico-detalle-datos-ente-pc'
@@ -414,158 +1412,785 @@ class Scraper(WebScraping):
                       ' div:nth-child(4) label:nth-child(3)',
         }
         
-        # Read main table
-        self.sheets.create_set_sheet(self.sheet_main_name)
-        main_data = self.sheets.get_data()[2:]
+        # Wait until the general data is rendered
+        self.get_text(selectors["dependency"], required=True)
+        
+        # Extract general data
+        general_data = []
+        for _, selector_value in selectors.items():
+            value = self.get_text(selector_value)
+            general_data.append(value)
+        
+        # Don't save blank details (retried by the caller, restarting the browser)
+        if not any(value.strip() for value in general_data):
+            raise Exception("Details page without general data")
+        
+        # Extract internal tables
+        contracts = self.__extract_contracts__()
+        requirements = self.__extract_requirements__()
+        
+        return general_data, contracts, requirements
+    
+    def __save_details__(self, row: tuple, general_data: list, contracts: list,
+                         requirements: list, start_row: int = 0) -> int:
+        """ Save the details of a procedure, in the layout set in DETAILS_LAYOUT
         
-        # Remove duplicated data
-        main_data = list(set(map(tuple, main_data)))
+        Args:
+            row (tuple): row of the procedure in main table
+            general_data (list): general data from details page
+            contracts (list): matrix with contracts data
+            requirements (list): matrix with requirements data
+            start_row (int, optional): row to start writing the wide layout.
+                Defaults to 0 (append).
+            
+        Returns:
+            int: number of rows saved in details table (wide layout)
+        """
+        
+        if DETAILS_LAYOUT == "normalized":
+            procedure, contracts_rows, requirements_rows = split_normalized_rows(
+                row, general_data, contracts, requirements
+            )
+            
+            # Save the three tables at once (a single excel save), with the
+            # procedure last: it marks the id as completed. Append only outputs
+            # (jsonl, csv) can repeat the contracts and requirements of an id
+            # if the run stops while they are written
+            tables = []
+            if contracts_rows:
+                tables.append((self.sheet_contracts_name, contracts_rows))
+            if requirements_rows:
+                tables.append((self.sheet_requirements_name, requirements_rows))
+            tables.append((self.sheet_procedures_name, [procedure]))
+            self.sinks.write_tables(tables)
+            return 0
+        
+        data = merge_wide_rows(row, general_data, contracts, requirements)
+        self.sinks.write(self.sheet_details_name, data, start_row)
+        return len(data)
+    
+    def __get_details_resume__(self) -> tuple:
+        """ Detect the ids with details already saved, and where the last
+        details extraction stopped
+        
+        Returns:
+            tuple: (ids saved, in saved order, row to start writing details table)
+        """
+        
+        # Normalized layout: only the procedure rows mark the ids as completed
+        if DETAILS_LAYOUT == "normalized":
+            procedures = self.__read_sheet__(self.sheet_procedures_name)
+            return [row[0] for row in procedures if row[0]], 0
+        
+        # Wide layout: write again the rows of the last id saved
+        details_data = self.__read_sheet__(self.sheet_details_name, start_row=1)
+        saved_ids = [row[0] for row in details_data if row[0]]
+        last_index_details = saved_ids.index(saved_ids[-1]) if saved_ids else 0
+        
+        return saved_ids, 3 + last_index_details
+            
+    def __get_details_work__(self, main_data: list) -> tuple:
+        """ Main table rows without details saved, in priority order
+        (if there is a PRIORITY) or in saved order
+        
+        Args:
+            main_data (list): main table rows
+            
+        Returns:
+            tuple: (rows to process, row to start writing details table)
+        """
+        
+        saved_ids, rows_saved = self.__get_details_resume__()
+        
+        # Wide layout: extract again the last id saved first, in its rows
+        # (or write after all the rows if the id is not in main table)
+        last_rows = []
+        if DETAILS_LAYOUT == "wide" and saved_ids:
+            last_rows = [row for row in main_data if row[0] == saved_ids[-1]][:1]
+            if not last_rows:
+                rows_saved = 3 + len(saved_ids)
+        
+        # Pending ids by id, not by position: the pipeline and the task queue
+        # skip the failed ids and save the ids in completion order
+        saved_ids = set(saved_ids)
+        pending_rows = [row for row in main_data if row[0] not in saved_ids]
+        if SCHEDULER:
+            pending_rows = SCHEDULER.sort(pending_rows)
+        
+        return last_rows + pending_rows, rows_saved
+    
+    def __extract_details_id__(self, row: tuple, rows_saved: int) -> int:
+        """ Extract and save the details of a procedure
+        
+        Args:
+            row (tuple): row of the procedure in main table
+            rows_saved (int): row to start writing the wide layout
+            
+        Returns:
+            int: number of rows saved in details table (wide layout)
+        """
+        
+        self.__open_details__(row[0])
+        general_data, contracts, requirements = self.__extract_details_page__()
+        return self.__save_details__(
+            row, general_data, contracts, requirements, rows_saved
+        )
+            
+    def __process_task_queue__(self, stage: str, process_row):
+        """ Claim and process the tasks of a stage in the task queue, until
+        there are no more tasks (pending or in process by other workers)
+        
+        Args:
+            stage (str): name of the stage: details or downloads
+            process_row (function): function that process a main table row,
+                returning the bytes downloaded (or None)
+        """
+        
+        counts = self.task_queue.get_counts(stage)
+        progress, own_progress = self.__get_progress__(
+            stage,
+            total=sum(counts.values()),
+            initial=counts.get("done", 0) + counts.get("failed", 0)
+        )
+        
+        while True:
+            
+            row = self.task_queue.claim(stage, WORKER_ID)
+            if not row:
                 
-        # Read data from excel
-        self.sheets.create_set_sheet(self.sheet_details_name)
+                # Wait for tasks that can be released by other workers
+                if self.task_queue.has_active_leases(stage):
+                    with self.watchdog.idle():
+                        sleep(60)
+                    continue
+                break
+            
+            id = row[0]
+            counts = self.task_queue.get_counts(stage)
+            log(f"\t{stage} of {id} (pending: {counts.get('pending', 0)},"
+                f" done: {counts.get('done', 0)})...")
+            
+            # Keep the task leased while it is processed
+            lease_renewer = LeaseRenewer(self.task_queue, stage, id, WORKER_ID)
+            lease_renewer.start()
+            start_time = perf_counter()
+            try:
+                bytes_downloaded = process_row(tuple(row))
+            except Exception as error:
+                log(f"\t\t{stage} of {id} failed: {error}")
+                self.task_queue.fail(stage, id, WORKER_ID, str(error))
+            else:
+                if not self.task_queue.complete(stage, id, WORKER_ID):
+                    log(f"\t\tLease of {id} lost: it was processed by other worker")
+                progress.update(latency=perf_counter() - start_time,
+                                bytes=bytes_downloaded or 0)
+            finally:
+                lease_renewer.stop()
+        
+        if own_progress:
+            progress.close()
+    
+    def extract_details(self):
+        """ Extract details from each id in the excel (or in the task queue) """
         
-        # Detect last rows saved
-        last_index_main = 0
-        last_index_details = 0
-        details_data = self.sheets.get_data()
-        details_data = list(filter(lambda row: row[0], details_data))
+        log("Extracting details tables...")
         
-        if details_data:
-            last_id = details_data[-1][0]
+        # Process only the ids claimed in the task queue
+        if self.task_queue:
             
-            for index in range(len(main_data)):
-                if main_data[index][0] == last_id:
-                    last_index_main = index
-                    break
+            def process_row(row: tuple):
+                self.__process_id__(row[0], lambda: self.__extract_details_id__(row, 0))
+                pause(30)
+            
+            self.__process_task_queue__("details", process_row)
+            return
+        
+        # Read main table
+        main_data = self.__get_main_rows__()
                 
-            for index in range(len(details_data)):
-                if details_data[index][0] == last_id:
-                    last_index_details = index
-                    break
+        # Detect last rows saved, and order the pending rows
+        work_rows, rows_saved = self.__get_details_work__(main_data)
         
-        rows_saved = 3 + last_index_details
         max_row = len(main_data)
-        for row in main_data[last_index_main:]:
+        initial = max_row - len(work_rows)
+        progress, own_progress = self.__get_progress__(
+            "details", total=max_row, initial=initial
+        )
+        for index_row, row in enumerate(work_rows, start=initial + 1):
                         
-            # Search id
             id = row[0]
-            index_row = main_data.index(row) + 1
-            print(f"\tExtracting details from {id} ({index_row}/{max_row})...")
-            self.__search_id__(id)
-            self.__wait_spinner__()
+            log(f"\tExtracting details from {id} ({index_row}/{max_row})...")
+            start_time = perf_counter()
+            rows_saved += self.__process_id__(
+                id, lambda: self.__extract_details_id__(row, rows_saved)
+            )
+            progress.update(latency=perf_counter() - start_time)
             
-            # Open details
-            self.click_js(selectors["id"])
-            self.__wait_spinner__()
-            sleep(8)
-            self.refresh_selenium()
-            
-            # Extract general data
-            general_data = []
-            selectors_copy = selectors.copy()
-            del selectors_copy["id"]
-            for _, selector_value in selectors_copy.items():
-                value = self.get_text(selector_value)
-                general_data.append(value)
-            
-            # Extract internal tables
-            contracts = self.__extract_contracts__()
-            
-            # Extract internal tables
-            requirements = self.__extract_requirements__()
-
-            # Merge contracts and requirements
-            data = []
-            len_contracts = len(contracts)
-            len_requirements = len(requirements)
-            for index in range(max(len_contracts, len_requirements)):
+            pause(30)
+        
+        if own_progress:
+            progress.close()
+    
+    def __extract_details_files_id__(self, row: tuple, rows_saved: int) -> tuple:
+        """ Extract the details of a procedure and download its files
+        in the same visit to its details page
+        
+        Args:
+            row (tuple): row of the procedure in main table
+            rows_saved (int): row to start writing the wide layout
+            
+        Returns:
+            tuple: (rows saved in details table (wide layout), bytes downloaded)
+        """
+        
+        id = row[0]
+        manifest = DownloadManifest(os.path.join(self.downloads_folder, id), id)
+        downloaded_size = manifest.get_downloaded_size()
+        saved = {}
+        
+        def process():
+            self.__open_details__(id)
+            
+            # Save details only once (retries after a restart only download files)
+            if "rows" not in saved:
+                general_data, contracts, requirements = self.__extract_details_page__()
+                saved["rows"] = self.__save_details__(
+                    row, general_data, contracts, requirements, rows_saved
+                )
+            
+            if not manifest.is_complete():
+                self.__download_files_current__(id, manifest)
+            return saved["rows"]
+        
+        rows = self.__process_id__(id, process)
+        return rows, manifest.get_downloaded_size() - downloaded_size
+    
+    def extract_details_and_files(self):
+        """ Extract details and download the attached files of each id in
+        the excel (or in the task queue), visiting each details page once
+        """
+        
+        log("Extracting details tables and downloading files...")
+        
+        # Hashes of the files already downloaded
+        self.hash_index = HashIndex(self.downloads_folder)
+        
+        # Process only the ids claimed in the task queue
+        if self.task_queue:
+            
+            def process_row(row: tuple) -> int:
+                _, bytes_downloaded = self.__extract_details_files_id__(row, 0)
+                pause(30)
+                return bytes_downloaded
+            
+            self.__process_task_queue__("details", process_row)
+        
+        else:
+            
+            # Read main table, detect last rows saved and order the pending rows
+            main_data = self.__get_main_rows__()
+            work_rows, rows_saved = self.__get_details_work__(main_data)
+            
+            max_row = len(main_data)
+            initial = max_row - len(work_rows)
+            progress, own_progress = self.__get_progress__(
+                "details", total=max_row, initial=initial
+            )
+            for index_row, row in enumerate(work_rows, start=initial + 1):
                 
-                # Add data or empty cell
-                if index < len_contracts:
-                    contract = contracts[index]
-                else:
-                    contract = [" "] * 4
-                    
-                if index < len_requirements:
-                    requirement = requirements[index]
-                else:
-                    requirement = [" "] * 6
-                    
-                data.append(list(row) + general_data + contract + requirement)
+                id = row[0]
+                log(f"\tExtracting details and files from {id}"
+                    f" ({index_row}/{max_row})...")
+                start_time = perf_counter()
+                rows, bytes_downloaded = self.__extract_details_files_id__(row, rows_saved)
+                rows_saved += rows
+                progress.update(latency=perf_counter() - start_time,
+                                bytes=bytes_downloaded)
                 
-            # Write data in excel
-            self.sheets.write_data(data, rows_saved)
-            self.sheets.save()
-            rows_saved += len(data)
+                pause(30)
+            
+            if own_progress:
+                progress.close()
+        
+        # Files of the ids with details saved before (complete ids are skipped)
+        self.download_files()
+    
+    def extract_details_queue(self, ids_queue: Queue):
+        """ Extract details from the main rows received in a queue, until
+        receive None
+        
+        Args:
+            ids_queue (Queue): queue with main table rows
+        """
+        
+        progress, own_progress = self.__get_progress__("details")
+        while True:
+            with self.watchdog.idle():
+                row = ids_queue.get()
+            if row is None:
+                break
+            
+            # Wait for a free worker slot
+            if self.concurrency:
+                with self.watchdog.idle():
+                    self.concurrency.acquire()
+            
+            id = row[0]
+            log(f"\tExtracting details from {id}...")
+            start_time = perf_counter()
+            errors = self.errors
+            try:
+                self.__process_id__(id, lambda: self.__extract_details_id__(row, 0))
+            except Exception as error:
+                log(f"\t\tDetails of {id} not extracted: {error}")
+                self.errors += 1
+            latency = perf_counter() - start_time
+            progress.update(latency=latency)
             
-            sleep(30)
+            pause(30)
+            
+            if self.concurrency:
+                self.concurrency.release(latency, failed=self.errors > errors)
+        
+        if own_progress:
+            progress.close()
 
     def download_files(self):
-        """ Download attached files from each id in the excel """
+        """ Download attached files from each id in the excel (or in the
+        task queue)
+        """
         
-        selectors = {
-            "id": 'tr:nth-child(1) > td:nth-child(2)',
-        }
+        # Hashes of the files already downloaded
+        self.hash_index = HashIndex(self.downloads_folder)
+        
+        # Process only the ids claimed in the task queue
+        if self.task_queue:
+            self.__process_task_queue__(
+                "downloads",
+                lambda row: self.__download_files_row__(row, "task queue")
+            )
+            return
         
         # Read main table
-        self.sheets.create_set_sheet(self.sheet_main_name)
-        sheets_data = self.sheets.get_data()[2:]
+        sheets_data = self.__get_main_rows__()
+        if SCHEDULER:
+            sheets_data = SCHEDULER.sort(sheets_data)
         
-        # Remove duplicated data
-        sheets_data = list(set(map(tuple, sheets_data)))
+        max_row = len(sheets_data)
+        progress, own_progress = self.__get_progress__("downloads", total=max_row)
+        for index_row, row in enumerate(sheets_data, start=1):
+            self.__download_files_row_progress__(
+                row, f"{index_row}/{max_row}", progress
+            )
+        
+        if own_progress:
+            progress.close()
+    
+    def download_files_queue(self, ids_queue: Queue):
+        """ Download attached files from the main rows received in a queue,
+        until receive None
         
-        # Read data from excel
-        self.sheets.create_set_sheet(self.sheet_details_name)
+        Args:
+            ids_queue (Queue): queue with main table rows
+        """
         
-        max_row = len(sheets_data)
-        for row in sheets_data:
+        # Hashes of the files already downloaded
+        self.hash_index = HashIndex(self.downloads_folder)
+        
+        progress, own_progress = self.__get_progress__("downloads")
+        while True:
+            with self.watchdog.idle():
+                row = ids_queue.get()
+            if row is None:
+                break
             
-            id = row[0]
+            try:
+                self.__download_files_row_progress__(
+                    row, f"queue: {ids_queue.qsize()}", progress
+                )
+            except Exception as error:
+                log(f"\t\tFiles of {row[0]} not downloaded: {error}")
+                progress.update()
+        
+        if own_progress:
+            progress.close()
+    
+    def __download_files_row_progress__(self, row: tuple, progress_text: str,
+                                        progress: StageProgress):
+        """ Download the attached files of a main table row, updating the
+        progress bar
+        
+        Args:
+            row (tuple): row of the procedure in main table
+            progress_text (str): progress text to show
+            progress (StageProgress): progress bar of the downloads
+        """
+        
+        start_time = perf_counter()
+        bytes_downloaded = self.__download_files_row__(row, progress_text)
+        
+        # Latency only of the ids visited (not of the skipped ones)
+        if bytes_downloaded is None:
+            progress.update()
+        else:
+            progress.update(latency=perf_counter() - start_time, bytes=bytes_downloaded)
+    
+    def __download_files_row__(self, row: tuple, progress: str) -> int:
+        """ Download the attached files of a main table row, if they are
+        not already downloaded
+        
+        Args:
+            row (tuple): row of the procedure in main table
+            progress (str): progress text to show
             
-            # Skip if download folder already exists
-            id_folder = os.path.join(self.downloads_folder, id)
-            if os.path.exists(id_folder):
-                print(f"\tFiles already downloaded for {id}. Skipping...")
-                continue
-                        
-            # Search id
-            index_row = sheets_data.index(row) + 1
-            print(f"\tDownloading files from {id} ({index_row}/{max_row})...")
-            self.__search_id__(id)
-            self.__wait_spinner__()
+        Returns:
+            int: bytes downloaded, or None if the files were already downloaded
+        """
+        
+        id = row[0]
+        
+        # Skip if all files are already downloaded
+        id_folder = os.path.join(self.downloads_folder, id)
+        manifest = DownloadManifest(id_folder, id)
+        if manifest.is_complete():
+            log(f"\tFiles already downloaded for {id}. Skipping...")
+            return None
+                    
+        log(f"\tDownloading files from {id} ({progress})...")
+        downloaded_size = manifest.get_downloaded_size()
+        self.__process_id__(id, lambda: self.__download_files_id__(id, manifest))
+        return manifest.get_downloaded_size() - downloaded_size
+    
+    def __download_files_id__(self, id: str, manifest: DownloadManifest):
+        """ Download the missing and failed files of a procedure
+        
+        Args:
+            id (str): procedure id
+            manifest (DownloadManifest): manifest of the id files
+        """
+        
+        self.__open_details__(id)
+        self.__download_files_current__(id, manifest)
+    
+    def __download_files_current__(self, id: str, manifest: DownloadManifest):
+        """ Download the missing and failed files of the details page
+        already open
+        
+        Args:
+            id (str): procedure id
+            manifest (DownloadManifest): manifest of the id files
+        """
+        
+        while True:
+            more_pages = self.__download_files_page__(id, manifest)
+            if not more_pages:
+                break
+        
+        # Mark id as complete when no file failed
+        files = manifest.get_files()
+        failed = [name for name in files if not manifest.is_downloaded(name)]
+        manifest.set_complete(not failed)
+        manifest.save()
+                
             
-            # Open details
-            self.click_js(selectors["id"])
-            self.__wait_spinner__()
-            sleep(8)
-            self.refresh_selenium()
+def run_pipeline():
+    """ Extract main table, details and files at the same time: the new ids
+    found in main table are sent to the details and downloads scrapers
+    (each one with its own browser) while the next pages are extracted
+    """
+    
+    print("Running pipeline...")
+    
+    # Shared outputs
+    sheets = SpreadsheetManager(file_name=EXCEL_PATH)
+    sinks = create_sinks(OUTPUT_SINKS, sheets)
+    
+    # Consumers (details extraction and files download)
+    # Only one downloader: downloads are detected as new files in the
+    # shared browsers download folder
+    details_queue = Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    downloads_queue = Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    consumers = []
+    scrapers = []
+    
+    # Details workers active at the same time: all, or tuned with AIMD
+    # (from 1 to PIPELINE_DETAILS_WORKERS) using latency and errors
+    concurrency = None
+    if AUTO_CONCURRENCY:
+        concurrency = AimdController(
+            max_workers=PIPELINE_DETAILS_WORKERS,
+            window=CONCURRENCY_WINDOW
+        )
+    
+    # Close all the browsers (and save the outputs) even if the run crashes
+    try:
+        for _ in range(PIPELINE_DETAILS_WORKERS):
+            scraper = Scraper(sheets, sinks, restore_session=False)
+            scraper.concurrency = concurrency
+            scrapers.append(scraper)
+            consumers.append(Thread(target=PROFILER.run,
+                                    args=("details", scraper.extract_details_queue,
+                                          details_queue)))
+        scraper = Scraper(sheets, sinks, restore_session=False)
+        scrapers.append(scraper)
+        consumers.append(Thread(target=PROFILER.run,
+                                args=("downloads", scraper.download_files_queue,
+                                      downloads_queue)))
+        
+        # Producer (main table)
+        producer = Scraper(sheets, sinks)
+        scrapers.append(producer)
+        
+        # Progress of the consumers (ids added as they are found in main table)
+        progress = {
+            "details": StageProgress("details", total=0),
+            "downloads": StageProgress("downloads", total=0),
+        }
+        for scraper in scrapers:
+            scraper.progress = progress
+        
+        for consumer in consumers:
+            consumer.start()
+        
+        try:
+            producer.apply_filters()
+            ids_queues = [details_queue, downloads_queue]
+            if MAIN_TABLE_WORKERS > 1:
+                PROFILER.run("main_table", producer.extract_main_table_sharded,
+                             MAIN_TABLE_WORKERS, ids_queues)
+            else:
+                PROFILER.run("main_table", producer.extract_main_table,
+                             ids_queues=ids_queues)
+        finally:
             
-            # Download files
-            while True:
-                more_pages = self.__download_files_page__(id)
-                if not more_pages:
-                    break
-                
+            # Stop consumers when they finish the pending ids
+            for _ in range(PIPELINE_DETAILS_WORKERS):
+                details_queue.put(None)
+            downloads_queue.put(None)
+            for consumer in consumers:
+                consumer.join()
             
+            for stage_progress in progress.values():
+                stage_progress.close()
+    finally:
+        for scraper in scrapers:
+            scraper.close()
+        sinks.close()
+
+
+def add_tasks():
+    """ Add the ids saved in main table to the task queue """
+    
+    if not TASK_QUEUE_PATH:
+        print("TASK_QUEUE_PATH is not set")
+        return
+    
+    sheets = SpreadsheetManager(file_name=EXCEL_PATH)
+    sheets.create_set_sheet("main_table")
+    rows = [row for row in sheets.get_data(3) if row[0]]
+    
+    task_queue = TaskQueue(TASK_QUEUE_PATH, lease_time=TASK_LEASE_TIME)
+    for stage in ["details", "downloads"]:
+        new_tasks = task_queue.add_tasks(stage, rows, get_priorities(rows))
+        print(f"\t{stage}: {new_tasks} new tasks ({task_queue.get_counts(stage)})")
+
+
+def prepare_chrome_profile():
+    """ Create the chrome profile template: a chrome folder with the page
+    already loaded (warm cache), copied by each scraper when it starts
+    """
+    
+    if not CHROME_PROFILE_TEMPLATE:
+        print("CHROME_PROFILE_TEMPLATE is not set")
+        return
+    
+    print("Preparing chrome profile template...")
+    os.makedirs(CHROME_PROFILE_TEMPLATE, exist_ok=True)
+    browser = WebScraping(width=1920, height=1080, chrome_folder=CHROME_PROFILE_TEMPLATE)
+    browser.set_page(HOME_PAGE)
+    browser.wait_die(SELECTOR_SPINNER, time_out=300)
+    
+    # Wait until the cache and service worker are saved
+    sleep(10)
+    browser.end_browser()
+    print(f"\tTemplate saved in {CHROME_PROFILE_TEMPLATE}")
+
+
+def export_parquet():
+    """ Export the excel tables as parquet files """
+    
+    print("Exporting parquet files...")
+    exporter = ParquetExporter(PARQUET_FOLDER)
+    exported = exporter.export_spreadsheet(SpreadsheetManager(file_name=EXCEL_PATH))
+    for table_name, rows_num in exported.items():
+        print(f"\t{table_name}: {rows_num} rows")
+
+
+def export_wide_details():
+    """ Rebuild details table (wide layout) from the normalized tables """
+    
+    # The wide layout saves its own details table
+    if DETAILS_LAYOUT != "normalized":
+        print("DETAILS_LAYOUT is not normalized: details table not replaced")
+        return
+    
+    print("Exporting details table from normalized tables...")
+    sheets = SpreadsheetManager(file_name=EXCEL_PATH)
+    
+    # Read normalized tables
+    tables = {}
+    for sheet_name in ["procedures_table", "contracts_table", "requirements_table"]:
+        tables[sheet_name] = []
+        if sheet_name in sheets.get_sheets():
+            sheets.set_sheet(sheet_name)
+            tables[sheet_name] = [row for row in sheets.get_data(3) if row[0]]
+    
+    # Don't replace the saved details with an empty table
+    if not tables["procedures_table"]:
+        print("\tprocedures_table is empty: details table not replaced")
+        return
+    
+    data = list(build_wide_rows(
+        tables["procedures_table"],
+        tables["contracts_table"],
+        tables["requirements_table"],
+        len(MAIN_COLUMNS),
+    ))
+    
+    # Replace details table
+    if "details_table" in sheets.get_sheets():
+        sheets.delete_sheet("details_table")
+    sheets.create_set_sheet("details_table")
+    sheets.write_data(data, 3)
+    sheets.save()
+    print(f"\tdetails_table: {len(data)} rows")
+
+
+def extract_files_text():
+    """ Extract the text of the downloaded pdf files (new or changed only) """
+    
+    print("Extracting text from downloaded files...")
+    os.makedirs(DOWNLOADS_FOLDER, exist_ok=True)
+    sinks = create_sinks(OUTPUT_SINKS, SpreadsheetManager(file_name=EXCEL_PATH))
+    extractor = PdfTextExtractor(DOWNLOADS_FOLDER, workers=PDF_WORKERS)
+    try:
+        processed = extractor.run(sinks)
+    finally:
+        sinks.close()
+    print(f"\t{processed} files processed")
+
+
+def build_search_index():
+    """ Add to the search index the requirements and files text already saved """
+    
+    print("Building search index...")
+    index = SearchIndex(SEARCH_DB_PATH)
+    
+    # Requirements from excel
+    sheets = SpreadsheetManager(file_name=EXCEL_PATH)
+    for sheet_name in ["details_table", "requirements_table"]:
+        if sheet_name not in sheets.get_sheets():
+            continue
+        sheets.set_sheet(sheet_name)
+        rows = [row for row in sheets.get_data(3) if row[0]]
+        index.write(sheet_name, rows)
+        print(f"\t{sheet_name}: {len(rows)} rows")
+    
+    # Text of downloaded files
+    os.makedirs(DOWNLOADS_FOLDER, exist_ok=True)
+    extractor = PdfTextExtractor(DOWNLOADS_FOLDER)
+    files_num = 0
+    rows = []
+    for row in extractor.get_saved_texts():
+        rows.append(row)
+        files_num += 1
+        if len(rows) >= 100:
+            index.write("attachments_table", rows)
+            rows = []
+    index.write("attachments_table", rows)
+    print(f"\tattachments: {files_num} files")
+    
+    index.close()
+
+
+def search():
+    """ Search procedures by requirements and files text """
+    
+    query = input("Search: ").strip()
+    
+    index = SearchIndex(SEARCH_DB_PATH)
+    start_time = perf_counter()
+    try:
+        results = index.search(query)
+    except ValueError as error:
+        print(error)
+        return
+    finally:
+        index.close()
+    total_time = (perf_counter() - start_time) * 1000
+    
+    for result in results:
+        print(f"\t{result['id']} | {result['source']} {result['reference']}"
+              f" | {result['text'][:150]}")
+    ids = {result["id"] for result in results}
+    print(f"{len(results)} results, {len(ids)} procedures ({total_time:.1f} ms)")
+
+
 if __name__ == "__main__":
     
     # Main menu
-    print("1. Extract main data\n2. Extract details\n3. Download files")
+    print("1. Extract main data\n2. Extract details\n3. Download files"
+          "\n4. Export parquet files"
+          "\n5. Export details table from normalized tables"
+          "\n6. Extract text from downloaded files"
+          "\n7. Build search index from saved data"
+          "\n8. Search"
+          "\n9. Run pipeline (main data, details and files at the same time)"
+          "\n10. Add main data ids to the task queue"
+          "\n11. Prepare chrome profile template"
+          "\n12. Extract details and download files (one visit for each id)")
     option = input("Select an option: ").lower().strip()
     
-    # Start scraper
-    scraper = Scraper()
-    
-    if option == "1":
-        # Main table
-        scraper.apply_filters()
-        scraper.extract_main_table()
-    elif option == "2":
-        # details tables
-        scraper.extract_details()
-    elif option == "3":
-        # download files
-        scraper.download_files()
-    else:
-        print("Invalid option")
+    # Options without browser, or with their own browsers
+    standalone_options = {
+        "4": export_parquet,
+        "5": export_wide_details,
+        "6": extract_files_text,
+        "7": build_search_index,
+        "8": search,
+        "9": run_pipeline,
+        "10": add_tasks,
+        "11": prepare_chrome_profile,
+    }
+    if option in standalone_options:
+        standalone_options[option]()
+        quit()
+    
+    # Start scraper (only the main table uses the saved search)
+    scraper = Scraper(restore_session=option == "1")
+    
+    # Save the buffered outputs even if the run crashes
+    try:
+        if option == "1":
+            # Main table
+            scraper.apply_filters()
+            if MAIN_TABLE_WORKERS > 1:
+                PROFILER.run("main_table", scraper.extract_main_table_sharded,
+                             MAIN_TABLE_WORKERS)
+            else:
+                PROFILER.run("main_table", scraper.extract_main_table)
+        elif option == "2":
+            # details tables
+            PROFILER.run("details", scraper.extract_details)
+        elif option == "3":
+            # download files
+            PROFILER.run("downloads", scraper.download_files)
+        elif option == "12":
+            # details tables and files
+            PROFILER.run("details_files", scraper.extract_details_and_files)
+        else:
+            print("Invalid option")
+    finally:
+        scraper.close()
+        scraper.sinks.close()
        
\ No newline at end of file
@@ -0,0 +1,44 @@
+""" Column names of the tables generated by the scraper """
+
+# Main table (search results)
+MAIN_COLUMNS = ["id", "caracter", "name", "entity", "post_type"]
+
+# Details page
+GENERAL_COLUMNS = [
+    "dependency",
+    "branch",
+    "unity",
+    "in_charge",
+    "email",
+    "general_entity",
+]
+CONTRACT_COLUMNS = ["contract_num", "bidder", "date", "taxes"]
+REQUIREMENT_COLUMNS = [
+    "requirement_num",
+    "quantity",
+    "part",
+    "key",
+    "description",
+    "details",
+]
+
+# Wide details table (main row + general data + contract + requirement)
+DETAILS_COLUMNS = MAIN_COLUMNS + GENERAL_COLUMNS + CONTRACT_COLUMNS + REQUIREMENT_COLUMNS
+
+# Normalized details tables (keyed by procedure id)
+PROCEDURE_COLUMNS = MAIN_COLUMNS + GENERAL_COLUMNS
+CONTRACT_TABLE_COLUMNS = ["id"] + CONTRACT_COLUMNS
+REQUIREMENT_TABLE_COLUMNS = ["id"] + REQUIREMENT_COLUMNS
+
+# Text extracted from the attached pdf files
+ATTACHMENT_COLUMNS = ["id", "num", "type", "file", "pages", "text"]
+
+# Columns of each output table
+TABLE_COLUMNS = {
+    "main_table": MAIN_COLUMNS,
+    "details_table": DETAILS_COLUMNS,
+    "procedures_table": PROCEDURE_COLUMNS,
+    "contracts_table": CONTRACT_TABLE_COLUMNS,
+    "requirements_table": REQUIREMENT_TABLE_COLUMNS,
+    "attachments_table": ATTACHMENT_COLUMNS,
+}
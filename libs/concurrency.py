@@ -0,0 +1,89 @@
+import threading
+
+from libs.progress import log
+
+
+class AimdController ():
+    """ Limit of workers processing ids at the same time, tuned with AIMD:
+    the limit grows by one while the portal answers well, and it is halved
+    when the latency grows or the errors and time outs increase
+    """
+
+    def __init__(self, min_workers: int = 1, max_workers: int = 4,
+                 start_workers: int = 1, window: int = 10,
+                 max_error_rate: float = 0.1, max_latency_factor: float = 2):
+        """ Save settings
+
+        Args:
+            min_workers (int, optional): min active workers. Defaults to 1.
+            max_workers (int, optional): max active workers. Defaults to 4.
+            start_workers (int, optional): active workers at start. Defaults to 1.
+            window (int, optional): ids processed between adjusts. Defaults to 10.
+            max_error_rate (float, optional): max rate of failed ids (errors or
+                time outs) before reduce workers. Defaults to 0.1.
+            max_latency_factor (float, optional): max average latency, as times
+                of the best average latency, before reduce workers. Defaults to 2.
+        """
+
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.max_latency_factor = max_latency_factor
+
+        self.limit = max(min(start_workers, max_workers), min_workers)
+        self.active = 0
+        self.best_latency = None
+        self.__samples__ = []
+        self.__condition__ = threading.Condition()
+
+    def acquire(self):
+        """ Wait until the worker can process an id """
+
+        with self.__condition__:
+            while self.active >= self.limit:
+                self.__condition__.wait()
+            self.active += 1
+
+    def release(self, latency: float, failed: bool = False):
+        """ Register the result of an id and free the worker slot
+
+        Args:
+            latency (float): seconds used to process the id
+            failed (bool, optional): True if the id had errors or time outs.
+                Defaults to False.
+        """
+
+        with self.__condition__:
+            self.active -= 1
+            self.__samples__.append((latency, failed))
+            if len(self.__samples__) >= self.window:
+                self.__adjust__()
+            self.__condition__.notify_all()
+
+    def __adjust__(self):
+        """ Update the limit with the samples of the last window """
+
+        latencies = [latency for latency, failed in self.__samples__ if not failed]
+        error_rate = sum(failed for _, failed in self.__samples__) / len(self.__samples__)
+        self.__samples__ = []
+
+        average_latency = sum(latencies) / len(latencies) if latencies else 0
+        slow = False
+        if latencies:
+            if self.best_latency is None:
+                self.best_latency = average_latency
+            slow = average_latency > self.best_latency * self.max_latency_factor
+
+            # The best latency grows slowly, to adapt to slower pages
+            self.best_latency = min(average_latency, self.best_latency * 1.05)
+
+        old_limit = self.limit
+        if error_rate > self.max_error_rate or slow:
+            self.limit = max(self.min_workers, self.limit // 2)
+        else:
+            self.limit = min(self.max_workers, self.limit + 1)
+
+        if self.limit != old_limit:
+            log(f"\t\tActive workers: {old_limit} -> {self.limit} (errors:"
+                f" {error_rate:.0%}, latency: {average_latency:.1f}s)")
@@ -0,0 +1,91 @@
+class IdIndex ():
+    """ In-memory index of the procedure ids saved in a table,
+    with the row where each id is stored
+    """
+
+    def __init__(self, start_row: int = 3):
+        """ Create an empty index
+
+        Args:
+            start_row (int, optional): first row with data. Defaults to 3.
+        """
+
+        self.start_row = start_row
+        self.next_row = start_row
+        self.__rows__ = {}
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.__rows__
+
+    def __len__(self) -> int:
+        return len(self.__rows__)
+
+    def load(self, data: list):
+        """ Seed the index with the data already saved in the table
+
+        Args:
+            data (list): matrix of data, starting in the first row with data
+        """
+
+        self.__rows__ = {}
+        self.next_row = self.start_row
+        for row_num, row in enumerate(data, start=self.start_row):
+            self.next_row = row_num + 1
+
+            # Skip empty rows and keep the first row of each id
+            if not row or not row[0] or row[0] in self.__rows__:
+                continue
+            self.__rows__[row[0]] = row_num
+
+    def get_row(self, id: str) -> int:
+        """ Row where an id is saved
+
+        Args:
+            id (str): procedure id
+
+        Returns:
+            int: row number, or None if the id is not saved
+        """
+
+        return self.__rows__.get(id)
+
+    def add(self, id: str) -> int:
+        """ Register a new id in the next free row
+
+        Args:
+            id (str): procedure id
+
+        Returns:
+            int: row assigned to the id
+        """
+
+        row_num = self.next_row
+        self.__rows__[id] = row_num
+        self.next_row += 1
+        return row_num
+
+    def split(self, data: list) -> tuple:
+        """ Split rows in new and already saved ids. Duplicated ids inside
+        the data are kept only once
+
+        Args:
+            data (list): matrix of data, with the id in the first column
+
+        Returns:
+            tuple: (new rows, known rows)
+        """
+
+        new_rows = []
+        known_rows = []
+        new_ids = set()
+        for row in data:
+            id = row[0]
+            if not id or id in new_ids:
+                continue
+            if id in self.__rows__:
+                known_rows.append(row)
+            else:
+                new_ids.add(id)
+                new_rows.append(row)
+
+        return new_rows, known_rows
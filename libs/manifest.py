@@ -0,0 +1,226 @@
+import os
+import json
+import hashlib
+
+
+def get_file_hash(path: str) -> str:
+    """ Calculate the SHA-256 of a file, reading it in chunks
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        str: hex digest of the file content
+    """
+
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+class DownloadManifest ():
+    """ Manifest of the attached files of a procedure, saved as
+    manifest.json inside the id download folder
+    """
+
+    def __init__(self, folder: str, id: str):
+        """ Load the manifest of the folder, or create it from the files
+        already downloaded in the folder
+
+        Args:
+            folder (str): download folder of the id
+            id (str): procedure id
+        """
+
+        self.folder = folder
+        self.path = os.path.join(folder, "manifest.json")
+        self.data = {
+            "id": id,
+            "complete": False,
+            "files": {},
+        }
+
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as file:
+                self.data = json.load(file)
+        elif os.path.isdir(folder):
+            self.__load_old_files__()
+
+    def __load_old_files__(self):
+        """ Register the files downloaded before manifests existed
+        (file names like "<id> - <num> - <type>.pdf")
+        """
+
+        prefix = f"{self.data['id']} - "
+        for file_name in os.listdir(self.folder):
+            if not file_name.startswith(prefix) or not file_name.endswith(".pdf"):
+                continue
+
+            parts = file_name[len(prefix):-len(".pdf")].split(" - ", 1)
+            num = parts[0]
+            type = parts[1] if len(parts) > 1 else ""
+            self.add_file(num, type, file_name, "done")
+
+    def get_files(self) -> dict:
+        """ Files registered in the manifest
+
+        Returns:
+            dict: file data by file name
+        """
+
+        return self.data["files"]
+
+    def get_file_path(self, file_name: str) -> str:
+        """ Path of a file of the manifest
+
+        Args:
+            file_name (str): name of the file
+
+        Returns:
+            str: path of the file, inside the id folder
+        """
+
+        return os.path.join(self.folder, file_name)
+
+    def is_downloaded(self, file_name: str) -> bool:
+        """ Check if a file was downloaded and it is still in the folder
+
+        Args:
+            file_name (str): name of the file
+
+        Returns:
+            bool: True if the file doesn't need to be downloaded again
+        """
+
+        file_data = self.data["files"].get(file_name)
+        if not file_data or file_data["status"] != "done":
+            return False
+
+        path = self.get_file_path(file_name)
+        return os.path.exists(path) and os.path.getsize(path) == file_data["size"]
+
+    def add_file(self, num: str, type: str, file_name: str, status: str):
+        """ Register a file in the manifest, saving its size and hash
+        if it was downloaded
+
+        Args:
+            num (str): number of the file in the attachments table
+            type (str): document type
+            file_name (str): name of the file
+            status (str): "done" or "failed"
+        """
+
+        size = 0
+        sha256 = ""
+        path = self.get_file_path(file_name)
+        if status == "done":
+            size = os.path.getsize(path)
+            sha256 = get_file_hash(path)
+
+        self.data["files"][file_name] = {
+            "num": num,
+            "type": type,
+            "size": size,
+            "sha256": sha256,
+            "status": status,
+        }
+
+    def get_downloaded_size(self) -> int:
+        """ Total size of the files downloaded
+
+        Returns:
+            int: size in bytes
+        """
+
+        files = self.data["files"].values()
+        return sum(file_data["size"] for file_data in files if file_data["status"] == "done")
+
+    def is_complete(self) -> bool:
+        """ Check if all the attachments of the id were downloaded
+
+        Returns:
+            bool: True if all the pages were visited and all files are downloaded
+        """
+
+        if not self.data["complete"]:
+            return False
+
+        for file_name in self.data["files"]:
+            if not self.is_downloaded(file_name):
+                return False
+        return True
+
+    def set_complete(self, complete: bool):
+        """ Mark if all the attachments pages were visited without failures
+
+        Args:
+            complete (bool): True if the id doesn't need to be visited again
+        """
+
+        self.data["complete"] = complete
+
+    def save(self):
+        """ Save the manifest (replacing the old one at once) """
+
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, ensure_ascii=False, indent=4)
+        os.replace(temp_path, self.path)
+
+
+class HashIndex ():
+    """ Index of the downloaded files by content hash, used to store
+    identical files only once (with hardlinks)
+    """
+
+    def __init__(self, downloads_folder: str):
+        """ Load the hashes of all manifests in the downloads folder
+
+        Args:
+            downloads_folder (str): folder with a sub folder for each id
+        """
+
+        self.__paths__ = {}
+
+        for id in os.listdir(downloads_folder):
+            manifest_path = os.path.join(downloads_folder, id, "manifest.json")
+            if not os.path.exists(manifest_path):
+                continue
+
+            manifest = DownloadManifest(os.path.join(downloads_folder, id), id)
+            for file_name, file_data in manifest.get_files().items():
+                if file_data["status"] == "done" and file_data["sha256"]:
+                    path = manifest.get_file_path(file_name)
+                    self.__paths__.setdefault(file_data["sha256"], path)
+
+    def link_duplicate(self, path: str, sha256: str) -> bool:
+        """ Replace the file with a hardlink to a file with the same content,
+        or register it if its content is new
+
+        Args:
+            path (str): path of the downloaded file
+            sha256 (str): hash of the file
+
+        Returns:
+            bool: True if the file was replaced with a hardlink
+        """
+
+        original_path = self.__paths__.get(sha256)
+        if not original_path or not os.path.exists(original_path):
+            self.__paths__[sha256] = path
+            return False
+
+        if os.path.samefile(original_path, path):
+            return False
+
+        # Link to a temp file first, to don't lose the file if link fails
+        temp_path = f"{path}.link"
+        try:
+            os.link(original_path, temp_path)
+        except OSError:
+            return False
+        os.replace(temp_path, path)
+        return True
@@ -0,0 +1,95 @@
+from libs.columns import GENERAL_COLUMNS, CONTRACT_COLUMNS, REQUIREMENT_COLUMNS
+
+
+def merge_wide_rows(main_row: list, general_data: list,
+                    contracts: list, requirements: list) -> list:
+    """ Merge the details of a procedure in wide rows: main row, general data,
+    and contracts and requirements aligned by index (padded with empty cells)
+
+    Args:
+        main_row (list): row of the procedure in main table
+        general_data (list): general data from details page
+        contracts (list): matrix with contracts data
+        requirements (list): matrix with requirements data
+
+    Returns:
+        list: matrix with the wide rows
+    """
+
+    data = []
+    len_contracts = len(contracts)
+    len_requirements = len(requirements)
+    for index in range(max(len_contracts, len_requirements)):
+
+        # Add data or empty cell
+        if index < len_contracts:
+            contract = list(contracts[index])
+        else:
+            contract = [" "] * len(CONTRACT_COLUMNS)
+
+        if index < len_requirements:
+            requirement = list(requirements[index])
+        else:
+            requirement = [" "] * len(REQUIREMENT_COLUMNS)
+
+        data.append(list(main_row) + list(general_data) + contract + requirement)
+
+    return data
+
+
+def split_normalized_rows(main_row: list, general_data: list,
+                          contracts: list, requirements: list) -> tuple:
+    """ Split the details of a procedure in normalized rows, keyed by id
+
+    Args:
+        main_row (list): row of the procedure in main table
+        general_data (list): general data from details page
+        contracts (list): matrix with contracts data
+        requirements (list): matrix with requirements data
+
+    Returns:
+        tuple: (procedure row, contracts rows, requirements rows)
+    """
+
+    id = main_row[0]
+    procedure = list(main_row) + list(general_data)
+    contracts_rows = [[id] + list(contract) for contract in contracts]
+    requirements_rows = [[id] + list(requirement) for requirement in requirements]
+
+    return procedure, contracts_rows, requirements_rows
+
+
+def build_wide_rows(procedures: list, contracts: list, requirements: list,
+                    main_columns_num: int):
+    """ Rebuild the wide details rows from the normalized tables
+
+    Args:
+        procedures (list): rows of procedures table (main row + general data)
+        contracts (list): rows of contracts table (id + contract data)
+        requirements (list): rows of requirements table (id + requirement data)
+        main_columns_num (int): number of main table columns in procedures rows
+
+    Yields:
+        list: wide rows, in procedures order
+    """
+
+    # Group internal tables by id
+    contracts_by_id = {}
+    for row in contracts:
+        contract = row[1:1 + len(CONTRACT_COLUMNS)]
+        contracts_by_id.setdefault(row[0], []).append(contract)
+
+    requirements_by_id = {}
+    for row in requirements:
+        requirement = row[1:1 + len(REQUIREMENT_COLUMNS)]
+        requirements_by_id.setdefault(row[0], []).append(requirement)
+
+    general_end = main_columns_num + len(GENERAL_COLUMNS)
+    for procedure in procedures:
+        id = procedure[0]
+        yield from merge_wide_rows(
+            procedure[:main_columns_num],
+            procedure[main_columns_num:general_end],
+            contracts_by_id.get(id, []),
+            requirements_by_id.get(id, []),
+        )
@@ -0,0 +1,261 @@
+import os
+import re
+import uuid
+import shutil
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from libs.columns import TABLE_COLUMNS
+
+
+class ParquetExporter ():
+    """ Export scraped tables as parquet datasets, with typed columns
+    and partitioned by year and entity
+    """
+
+    # Arrow types of the non text columns
+    column_types = {
+        "year": pa.int16(),
+        "contract_num": pa.int32(),
+        "requirement_num": pa.int32(),
+        "quantity": pa.float64(),
+        "taxes": pa.float64(),
+        "date": pa.date32(),
+        "pages": pa.int32(),
+    }
+
+    partition_columns = ["year", "entity"]
+
+    def __init__(self, folder: str, row_group_size: int = 100000):
+        """ Save settings and create output folder
+
+        Args:
+            folder (str): folder where the datasets will be saved
+            row_group_size (int, optional): max rows in each row group.
+                Defaults to 100000.
+        """
+
+        self.folder = folder
+        self.row_group_size = row_group_size
+        self.tables = dict(TABLE_COLUMNS)
+        self.__buffers__ = {}
+
+        os.makedirs(self.folder, exist_ok=True)
+
+    def __to_int__(self, value) -> int:
+        """ Convert text from the page to int (None if not valid) """
+
+        try:
+            return int(float(str(value).replace(",", "").strip()))
+        except ValueError:
+            return None
+
+    def __to_float__(self, value) -> float:
+        """ Convert text from the page to float (None if not valid) """
+
+        value = str(value).replace("$", "").replace(",", "").strip()
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def __to_date__(self, value) -> datetime:
+        """ Convert text from the page to date (None if not valid) """
+
+        if isinstance(value, datetime):
+            return value.date()
+
+        value = str(value).strip()
+        for date_format in ["%d/%m/%Y %H:%M", "%d/%m/%Y", "%Y-%m-%d"]:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        return None
+
+    def __get_year__(self, id: str) -> int:
+        """ Get procedure year from the end of the id (like "...-2023") """
+
+        match = re.search(r"(\d{4})\s*$", str(id))
+        if match:
+            return int(match.group(1))
+        return None
+
+    def __convert_value__(self, column: str, value):
+        """ Convert a single cell to the type of its column """
+
+        if value is None or str(value).strip() == "":
+            return None
+
+        column_type = self.column_types.get(column, pa.string())
+        if column_type == pa.date32():
+            return self.__to_date__(value)
+        if column_type == pa.float64():
+            return self.__to_float__(value)
+        if pa.types.is_integer(column_type):
+            return self.__to_int__(value)
+        return str(value).strip()
+
+    def get_schema(self, table_name: str) -> pa.Schema:
+        """ Arrow schema of a table
+
+        Args:
+            table_name (str): name of the table
+
+        Returns:
+            pa.Schema: schema with the table columns plus the year
+        """
+
+        columns = self.tables[table_name] + ["year"]
+        fields = []
+        for column in columns:
+            fields.append(pa.field(column, self.column_types.get(column, pa.string())))
+        return pa.schema(fields)
+
+    def get_partition_columns(self, table_name: str) -> list:
+        """ Partition columns of a table (normalized contracts and requirements
+        tables don't have entity, so they are partitioned only by year)
+
+        Args:
+            table_name (str): name of the table
+
+        Returns:
+            list: names of the partition columns
+        """
+
+        columns = self.tables[table_name] + ["year"]
+        return [column for column in self.partition_columns if column in columns]
+
+    def get_table_folder(self, table_name: str) -> str:
+        """ Folder of the dataset of a table
+
+        Args:
+            table_name (str): name of the table
+
+        Returns:
+            str: path of the dataset folder
+        """
+
+        return os.path.join(self.folder, table_name)
+
+    def __to_arrow__(self, table_name: str, rows: list) -> pa.Table:
+        """ Convert a matrix of scraped rows to a typed arrow table
+
+        Args:
+            table_name (str): name of the table
+            rows (list): matrix of data, with the columns of the table
+
+        Returns:
+            pa.Table: typed table
+        """
+
+        columns = self.tables[table_name]
+        values = {column: [] for column in columns + ["year"]}
+        for row in rows:
+            row = list(row)[:len(columns)]
+            row += [None] * (len(columns) - len(row))
+            for column, value in zip(columns, row):
+                values[column].append(self.__convert_value__(column, value))
+            values["year"].append(self.__get_year__(row[0]))
+
+        return pa.table(values, schema=self.get_schema(table_name))
+
+    def write_records(self, table_name: str, rows: list):
+        """ Add rows to the table, saving them each time a row group is full
+
+        Args:
+            table_name (str): name of the table
+            rows (list): matrix of data, with the columns of the table
+        """
+
+        # Skip empty rows (without id)
+        rows = [row for row in rows if row and row[0]]
+
+        buffer = self.__buffers__.setdefault(table_name, [])
+        buffer.extend(rows)
+        if len(buffer) >= self.row_group_size:
+            self.flush(table_name)
+
+    def flush(self, table_name: str = ""):
+        """ Save buffered rows in parquet files
+
+        Args:
+            table_name (str, optional): table to save. Defaults to "" (all tables).
+        """
+
+        table_names = [table_name] if table_name else list(self.__buffers__.keys())
+        for name in table_names:
+            rows = self.__buffers__.get(name, [])
+            if not rows:
+                continue
+
+            ds.write_dataset(
+                self.__to_arrow__(name, rows),
+                self.get_table_folder(name),
+                format="parquet",
+                partitioning=self.get_partition_columns(name),
+                partitioning_flavor="hive",
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                max_rows_per_group=self.row_group_size,
+            )
+            self.__buffers__[name] = []
+
+    def close(self):
+        """ Save all pending rows """
+
+        self.flush()
+
+    def export_spreadsheet(self, sheets, start_row: int = 3) -> dict:
+        """ Replace the datasets with the data of the known sheets in the excel file
+
+        Args:
+            sheets (SpreadsheetManager): spreadsheet with the scraped data
+            start_row (int, optional): first row with data. Defaults to 3.
+
+        Returns:
+            dict: rows exported by table
+        """
+
+        exported = {}
+        for table_name in self.tables:
+            if table_name not in sheets.get_sheets():
+                continue
+
+            shutil.rmtree(self.get_table_folder(table_name), ignore_errors=True)
+
+            sheet = sheets.wb[table_name]
+            rows_num = 0
+            for row in sheet.iter_rows(min_row=start_row, values_only=True):
+                if not row or not row[0]:
+                    continue
+                self.write_records(table_name, [row])
+                rows_num += 1
+
+            self.flush(table_name)
+            exported[table_name] = rows_num
+
+        return exported
+
+    def get_dataset(self, table_name: str) -> ds.Dataset:
+        """ Open a saved table, for fast queries with pyarrow / pandas
+
+        Args:
+            table_name (str): name of the table
+
+        Returns:
+            ds.Dataset: partitioned dataset of the table
+        """
+
+        schema = self.get_schema(table_name)
+        partition_fields = []
+        for column in self.get_partition_columns(table_name):
+            partition_fields.append(schema.field(column))
+        partitioning = ds.partitioning(pa.schema(partition_fields), flavor="hive")
+        return ds.dataset(
+            self.get_table_folder(table_name),
+            format="parquet",
+            partitioning=partitioning,
+        )
@@ -0,0 +1,190 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pypdf import PdfReader
+
+from libs.manifest import DownloadManifest
+
+
+def extract_pdf_text(path: str) -> tuple:
+    """ Extract the text of all pages of a pdf file (runs in worker processes)
+
+    Args:
+        path (str): path of the pdf file
+
+    Returns:
+        tuple: (text, pages number, error message)
+    """
+
+    try:
+        reader = PdfReader(path)
+        texts = []
+        for page in reader.pages:
+            texts.append(page.extract_text() or "")
+        return "\n".join(texts), len(reader.pages), ""
+    except Exception as error:
+        return "", 0, str(error)
+
+
+class PdfTextExtractor ():
+    """ Extract the text of the downloaded pdf files in a process pool,
+    only for new or changed files
+    """
+
+    def __init__(self, downloads_folder: str, workers: int = 0):
+        """ Save settings
+
+        Args:
+            downloads_folder (str): folder with a sub folder for each id
+            workers (int, optional): number of processes. Defaults to 0 (all cores).
+        """
+
+        self.downloads_folder = downloads_folder
+        self.workers = workers or os.cpu_count()
+
+    def get_text_path(self, pdf_path: str) -> str:
+        """ Path of the text file of a pdf (saved next to the pdf)
+
+        Args:
+            pdf_path (str): path of the pdf file
+
+        Returns:
+            str: path of the txt file
+        """
+
+        return f"{os.path.splitext(pdf_path)[0]}.txt"
+
+    def get_pending(self) -> list:
+        """ Find the downloaded files without text, or with text from
+        an old version of the file
+
+        Returns:
+            list: tuples (manifest, file name)
+        """
+
+        pending = []
+        for id in sorted(os.listdir(self.downloads_folder)):
+            id_folder = os.path.join(self.downloads_folder, id)
+            if not os.path.exists(os.path.join(id_folder, "manifest.json")):
+                continue
+
+            manifest = DownloadManifest(id_folder, id)
+            for file_name, file_data in manifest.get_files().items():
+                if not manifest.is_downloaded(file_name):
+                    continue
+
+                # Skip files already processed (with text or with error)
+                text_path = self.get_text_path(manifest.get_file_path(file_name))
+                text_saved = os.path.exists(text_path) or file_data.get("text_error")
+                if file_data.get("text_sha256") == file_data["sha256"] and text_saved:
+                    continue
+
+                pending.append((manifest, file_name))
+
+        return pending
+
+    def get_saved_texts(self):
+        """ Read the texts already extracted from the downloaded files
+
+        Yields:
+            list: attachments table rows (id, num, type, file, pages, text)
+        """
+
+        for id in sorted(os.listdir(self.downloads_folder)):
+            id_folder = os.path.join(self.downloads_folder, id)
+            if not os.path.exists(os.path.join(id_folder, "manifest.json")):
+                continue
+
+            manifest = DownloadManifest(id_folder, id)
+            for file_name, file_data in manifest.get_files().items():
+                text_path = self.get_text_path(manifest.get_file_path(file_name))
+                if not os.path.exists(text_path):
+                    continue
+
+                with open(text_path, encoding="utf-8") as file:
+                    text = file.read()
+                pages = file_data.get("text_pages", 0)
+                yield [id, file_data["num"], file_data["type"], file_name, pages, text]
+
+    def run(self, sinks=None, batch_size: int = 100) -> int:
+        """ Extract the text of the pending files, saving it in txt files,
+        in the manifests and (optionally) in the sinks
+
+        Args:
+            sinks (Sink, optional): output for the attachments text records.
+                Defaults to None.
+            batch_size (int, optional): files written at once in the sinks.
+                Defaults to 100.
+
+        Returns:
+            int: number of files processed
+        """
+
+        pending = self.get_pending()
+        print(f"\t{len(pending)} files to process with {self.workers} processes")
+        if not pending:
+            return 0
+
+        # Group files with the same content, to extract each content once
+        files_by_hash = {}
+        for manifest, file_name in pending:
+            sha256 = manifest.get_files()[file_name]["sha256"]
+            files_by_hash.setdefault(sha256, []).append((manifest, file_name))
+
+        processed = 0
+        rows = []
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = {}
+                for sha256, files in files_by_hash.items():
+                    manifest, file_name = files[0]
+                    path = manifest.get_file_path(file_name)
+                    futures[executor.submit(extract_pdf_text, path)] = sha256
+
+                for future in as_completed(futures):
+                    sha256 = futures[future]
+                    text, pages, error = future.result()
+
+                    for manifest, file_name in files_by_hash[sha256]:
+                        row = self.__save_text__(manifest, file_name, text, pages, error)
+                        processed += 1
+
+                        if error:
+                            print(f"\t\tError extracting text from {file_name}: {error}")
+                        elif sinks:
+                            rows.append(row)
+
+                    # Write the records in batches
+                    if sinks and len(rows) >= batch_size:
+                        sinks.write("attachments_table", rows)
+                        rows = []
+        finally:
+            if sinks and rows:
+                sinks.write("attachments_table", rows)
+
+        return processed
+
+    def __save_text__(self, manifest: DownloadManifest, file_name: str, text: str,
+                      pages: int, error: str) -> list:
+        """ Save the text of a file in its txt file and manifest
+
+        Returns:
+            list: attachments table row (id, num, type, file, pages, text)
+        """
+
+        file_data = manifest.get_files()[file_name]
+
+        # Save errors in manifest, to retry them only when the file changes
+        file_data["text_sha256"] = file_data["sha256"]
+        file_data["text_pages"] = pages
+        file_data["text_error"] = error
+
+        if not error:
+            text_path = self.get_text_path(manifest.get_file_path(file_name))
+            with open(text_path, "w", encoding="utf-8") as file:
+                file.write(text)
+
+        manifest.save()
+
+        id = manifest.data["id"]
+        return [id, file_data["num"], file_data["type"], file_name, pages, text]
@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+import cProfile
+import threading
+from datetime import datetime
+
+from libs.progress import log
+
+
+class StackSampler (threading.Thread):
+    """ Sample the call stack of a thread at fixed intervals (low overhead
+    profiling for long runs), counting the collapsed stacks
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.01):
+        """ Save settings
+
+        Args:
+            thread_id (int): ident of the thread to sample
+            interval (float, optional): seconds between samples. Defaults to 0.01.
+        """
+
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.__stop_event__ = threading.Event()
+
+    def run(self):
+
+        while not self.__stop_event__.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            # Stack from the root call to the current function
+            calls = []
+            while frame is not None:
+                code = frame.f_code
+                calls.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack = ";".join(reversed(calls))
+            self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def stop(self):
+        """ Stop sampling """
+
+        self.__stop_event__.set()
+        self.join()
+
+    def save(self, path: str):
+        """ Save the stacks in collapsed format ("a;b;c count" lines),
+        used by flamegraph.pl, speedscope and inferno
+
+        Args:
+            path (str): path of the output file
+        """
+
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in sorted(self.stacks.items()):
+                file.write(f"{stack} {count}\n")
+
+
+class StageProfiler ():
+    """ Profile the stages of a run (one output file per stage), with cProfile
+    or with a stack sampler
+    """
+
+    modes = ["", "cprofile", "sample"]
+
+    def __init__(self, mode: str = "", folder: str = "profiles", interval: float = 0.01):
+        """ Save settings
+
+        Args:
+            mode (str, optional): "cprofile" (.prof files), "sample" (.folded
+                files) or "" (disabled). Defaults to "".
+            folder (str, optional): folder of the output files. Defaults to "profiles".
+            interval (float, optional): seconds between samples in sample mode.
+                Defaults to 0.01.
+        """
+
+        if mode not in self.modes:
+            raise ValueError(f"Invalid profile mode: {mode}")
+
+        self.mode = mode
+        self.folder = folder
+        self.interval = interval
+
+    def get_output_path(self, stage: str, extension: str) -> str:
+        """ Path of the profile of a stage (with date and thread, to don't
+        replace the profiles of other runs or workers)
+
+        Args:
+            stage (str): name of the stage
+            extension (str): file extension
+
+        Returns:
+            str: path of the output file
+        """
+
+        os.makedirs(self.folder, exist_ok=True)
+        date = datetime.now().strftime("%Y%m%d-%H%M%S")
+        thread_name = threading.current_thread().name
+        return os.path.join(self.folder, f"{stage}-{date}-{thread_name}.{extension}")
+
+    def run(self, stage: str, function, *args, **kwargs):
+        """ Run a stage, profiling it if the profiler is enabled
+
+        Args:
+            stage (str): name of the stage, used in the output file name
+            function (callable): function of the stage
+            *args: positional arguments of the function
+            **kwargs: keyword arguments of the function
+
+        Returns:
+            any: result of the function
+        """
+
+        if not self.mode:
+            return function(*args, **kwargs)
+
+        start_time = time.time()
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(function, *args, **kwargs)
+            finally:
+                path = self.get_output_path(stage, "prof")
+                profile.dump_stats(path)
+                log(f"\tProfile of {stage} ({time.time() - start_time:.0f}s)"
+                    f" saved in {path}")
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            sampler.stop()
+            path = self.get_output_path(stage, "folded")
+            sampler.save(path)
+            log(f"\tProfile of {stage} ({time.time() - start_time:.0f}s)"
+                f" saved in {path}")
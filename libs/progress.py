@@ -0,0 +1,86 @@
+import time
+import threading
+from collections import deque
+
+from tqdm import tqdm
+
+
+def log(message: str = ""):
+    """ Print a message above the progress bars (print breaks their display)
+
+    Args:
+        message (str, optional): text to print. Defaults to "".
+    """
+
+    tqdm.write(str(message))
+
+
+class StageProgress ():
+    """ Live progress bar of a stage, shared by all the workers of the stage,
+    with records per minute, rolling latency per item, bytes downloaded and ETA
+    """
+
+    def __init__(self, name: str, total: int = None, initial: int = 0,
+                 unit: str = "id", window: int = 20):
+        """ Create the progress bar
+
+        Args:
+            name (str): name of the stage
+            total (int, optional): items to process. Defaults to None (unknown).
+            initial (int, optional): items already processed. Defaults to 0.
+            unit (str, optional): name of the items. Defaults to "id".
+            window (int, optional): last items used in the average latency.
+                Defaults to 20.
+        """
+
+        self.bar = tqdm(total=total, initial=initial, desc=name, unit=unit,
+                        dynamic_ncols=True)
+        self.records = 0
+        self.bytes = 0
+        self.start_time = time.time()
+        self.__latencies__ = deque(maxlen=window)
+        self.__lock__ = threading.Lock()
+
+    def add_total(self, count: int):
+        """ Add items to process (like the new ids found by other stage)
+
+        Args:
+            count (int): new items
+        """
+
+        with self.__lock__:
+            self.bar.total = (self.bar.total or 0) + count
+            self.bar.refresh()
+
+    def update(self, count: int = 1, records: int = None, latency: float = None,
+               bytes: int = 0):
+        """ Register processed items
+
+        Args:
+            count (int, optional): items processed. Defaults to 1.
+            records (int, optional): records saved. Defaults to None (count).
+            latency (float, optional): seconds used by the item. Defaults to None.
+            bytes (int, optional): bytes downloaded. Defaults to 0.
+        """
+
+        with self.__lock__:
+            self.records += count if records is None else records
+            self.bytes += bytes
+            if latency is not None:
+                self.__latencies__.append(latency)
+
+            elapsed_minutes = max(time.time() - self.start_time, 1) / 60
+            postfix = {"records/min": f"{self.records / elapsed_minutes:.1f}"}
+            if self.__latencies__:
+                average = sum(self.__latencies__) / len(self.__latencies__)
+                postfix["latency"] = f"{average:.1f}s"
+            if self.bytes:
+                postfix["downloaded"] = f"{self.bytes / 1024 ** 2:.1f}MB"
+
+            self.bar.set_postfix(postfix, refresh=False)
+            self.bar.update(count)
+
+    def close(self):
+        """ Close the progress bar """
+
+        self.bar.close()
@@ -0,0 +1,108 @@
+import threading
+
+
+class ProxyPool ():
+    """ Pool of proxies shared by many scrapers, assigning to each browser
+    the healthiest and less used proxy
+    """
+
+    def __init__(self, proxies: list, min_score: float = 0.2):
+        """ Parse proxies
+
+        Args:
+            proxies (list): proxies like "host:port" or "user:pass@host:port"
+            min_score (float, optional): health score under which a proxy is only
+                used if there are no healthy proxies. Defaults to 0.2.
+        """
+
+        self.min_score = min_score
+        self.proxies = [self.parse_proxy(proxy) for proxy in proxies if proxy.strip()]
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.proxies)
+
+    def parse_proxy(self, proxy_text: str) -> dict:
+        """ Convert a proxy text to proxy data
+
+        Args:
+            proxy_text (str): proxy like "host:port" or "user:pass@host:port"
+
+        Returns:
+            dict: proxy data, with health score and usage counters
+        """
+
+        proxy_text = proxy_text.strip().split("://")[-1]
+        user = ""
+        password = ""
+        if "@" in proxy_text:
+            credentials, proxy_text = proxy_text.rsplit("@", 1)
+            user, password = credentials.split(":", 1)
+        server, port = proxy_text.rsplit(":", 1)
+
+        return {
+            "server": server,
+            "port": port,
+            "user": user,
+            "password": password,
+            "score": 1.0,
+            "in_use": 0,
+        }
+
+    def acquire(self, exclude: dict = None) -> dict:
+        """ Assign a proxy: the less used one, of the healthy proxies
+        (or of all proxies if none is healthy)
+
+        Args:
+            exclude (dict, optional): proxy to avoid if there are others.
+                Defaults to None.
+
+        Returns:
+            dict: proxy data
+        """
+
+        with self.lock:
+            candidates = [proxy for proxy in self.proxies if proxy is not exclude]
+            candidates = candidates or self.proxies
+
+            healthy = [proxy for proxy in candidates if proxy["score"] >= self.min_score]
+            candidates = healthy or candidates
+
+            proxy = min(candidates, key=lambda proxy: (proxy["in_use"], -proxy["score"]))
+            proxy["in_use"] += 1
+            return proxy
+
+    def release(self, proxy: dict):
+        """ Mark a proxy as not used by a browser
+
+        Args:
+            proxy (dict): proxy data
+        """
+
+        with self.lock:
+            proxy["in_use"] = max(proxy["in_use"] - 1, 0)
+
+    def report(self, proxy: dict, success: bool):
+        """ Update the health score of a proxy (moving average of successes)
+
+        Args:
+            proxy (dict): proxy data
+            success (bool): True if the request with the proxy worked
+        """
+
+        with self.lock:
+            proxy["score"] = 0.8 * proxy["score"] + 0.2 * (1 if success else 0)
+
+    def rotate(self, proxy: dict) -> dict:
+        """ Replace a failing proxy with other one
+
+        Args:
+            proxy (dict): proxy data of the failing proxy
+
+        Returns:
+            dict: new proxy data
+        """
+
+        self.report(proxy, False)
+        self.release(proxy)
+        return self.acquire(exclude=proxy)
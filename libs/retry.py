@@ -0,0 +1,168 @@
+import time
+import random
+import threading
+
+from selenium.common.exceptions import (
+    TimeoutException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+)
+
+from libs.progress import log
+
+
+class CircuitBreaker ():
+    """ Pause the browser actions of all the scrapers when many actions fail
+    in a row (portal down), instead of wasting time in requests that will fail
+    """
+
+    def __init__(self, threshold: int = 5, cool_down: int = 60,
+                 max_cool_down: int = 300):
+        """ Save settings
+
+        Args:
+            threshold (int, optional): failed actions in a row before open the
+                circuit. Defaults to 5.
+            cool_down (int, optional): seconds to pause the actions the first
+                time. Defaults to 60.
+            max_cool_down (int, optional): max seconds to pause the actions
+                (the pause is doubled each time the circuit opens again).
+                Defaults to 300.
+        """
+
+        self.threshold = threshold
+        self.cool_down = cool_down
+        self.max_cool_down = max_cool_down
+
+        self.failures = 0
+        self.open_until = 0
+        self.__current_cool_down__ = cool_down
+        self.__lock__ = threading.Lock()
+
+    def is_open(self) -> bool:
+        """ Check if the actions are paused
+
+        Returns:
+            bool: True if the circuit is open
+        """
+
+        return self.open_until > time.time()
+
+    def wait(self):
+        """ Wait until the circuit is closed """
+
+        while True:
+            with self.__lock__:
+                remaining = self.open_until - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 5))
+
+    def record_success(self):
+        """ Close the circuit after a successful action """
+
+        with self.__lock__:
+            self.failures = 0
+            self.__current_cool_down__ = self.cool_down
+
+    def record_failure(self):
+        """ Count a failed action, opening the circuit when the failures
+        reach the threshold
+        """
+
+        with self.__lock__:
+            self.failures += 1
+            if self.failures < self.threshold:
+                return
+
+            cool_down = self.__current_cool_down__
+            self.open_until = time.time() + cool_down
+            log(f"\t\t{self.failures} actions failed in a row."
+                f" Pausing all browsers {cool_down} seconds...")
+
+            # After the pause, one more failure opens the circuit again
+            self.failures = self.threshold - 1
+            self.__current_cool_down__ = min(cool_down * 2, self.max_cool_down)
+
+
+class RetryPolicy ():
+    """ Retry the browser actions that fail with transient errors,
+    waiting an exponential time with random jitter between attempts
+    """
+
+    # Errors of a page still loading or changing
+    retry_errors = (
+        TimeoutException,
+        NoSuchElementException,
+        StaleElementReferenceException,
+        ElementClickInterceptedException,
+        ElementNotInteractableException,
+    )
+
+    def __init__(self, retries: int = 3, base_delay: float = 1, max_delay: float = 30,
+                 breaker: CircuitBreaker = None):
+        """ Save settings
+
+        Args:
+            retries (int, optional): retries after the first attempt. Defaults to 3.
+            base_delay (float, optional): max seconds to wait before the first
+                retry. Defaults to 1.
+            max_delay (float, optional): max seconds to wait before a retry.
+                Defaults to 30.
+            breaker (CircuitBreaker, optional): circuit shared by all the scrapers.
+                Defaults to None.
+        """
+
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker
+
+    def get_delay(self, attempt: int) -> float:
+        """ Seconds to wait after a failed attempt ("full jitter" backoff)
+
+        Args:
+            attempt (int): number of the failed attempt, starting in 0
+
+        Returns:
+            float: seconds to wait
+        """
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def run(self, action, *args, **kwargs):
+        """ Run an action, retrying it when it fails with a transient error
+
+        Args:
+            action (callable): function to run
+            *args: positional arguments of the function
+            **kwargs: keyword arguments of the function
+
+        Returns:
+            any: result of the action
+
+        Raises:
+            Exception: last error of the action, when all the attempts failed
+        """
+
+        for attempt in range(self.retries + 1):
+            if self.breaker:
+                self.breaker.wait()
+
+            try:
+                result = action(*args, **kwargs)
+            except self.retry_errors as error:
+                last_error = error
+                if attempt < self.retries:
+                    time.sleep(self.get_delay(attempt))
+                continue
+
+            if self.breaker:
+                self.breaker.record_success()
+            return result
+
+        if self.breaker:
+            self.breaker.record_failure()
+        raise last_error
@@ -0,0 +1,122 @@
+import re
+import importlib
+
+from libs.columns import MAIN_COLUMNS
+
+
+def load_score_function(path: str):
+    """ Import a user scoring function
+
+    Args:
+        path (str): function path like "module:function". The function receives
+            a main table row and returns a number (higher is processed first)
+
+    Returns:
+        callable: scoring function
+    """
+
+    module_name, function_name = path.split(":", 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+class PriorityScheduler ():
+    """ Order the procedures of a work list by priority. The order is stable
+    (procedures with the same priority keep their saved order) and it is
+    the same in each run
+    """
+
+    # Keys with text values, sorted by the preferred values (or alphabetically)
+    text_keys = ["post_type", "caracter", "entity"]
+
+    def __init__(self, keys: list, preferences: dict = {}):
+        """ Save settings
+
+        Args:
+            keys (list): priority keys, from the most important: "date" (newest
+                procedures first, by id year and number), "post_type", "caracter",
+                "entity" or a scoring function path like "module:function"
+            preferences (dict, optional): preferred values (first is better)
+                of the text keys. Defaults to {}.
+        """
+
+        self.keys = keys
+        self.preferences = {
+            key: [value.lower() for value in values]
+            for key, values in preferences.items()
+        }
+
+        self.__score_functions__ = {}
+        for key in keys:
+            if ":" in key:
+                self.__score_functions__[key] = load_score_function(key)
+            elif key != "date" and key not in self.text_keys:
+                raise ValueError(f"Invalid priority key: {key}")
+
+    def __encode_desc__(self, number: float) -> str:
+        """ Text that sorts the numbers in descending order """
+
+        return f"{1e12 - float(number):024.6f}"
+
+    def __get_id_date__(self, id: str) -> tuple:
+        """ Year and number of a procedure, from the end of the id
+        (like "...-1234-2023")
+
+        Returns:
+            tuple: (year, number), with 0 when they are not found
+        """
+
+        match = re.search(r"(\d+)-(\d{4})\s*$", str(id))
+        if match:
+            return int(match.group(2)), int(match.group(1))
+
+        match = re.search(r"(\d{4})\s*$", str(id))
+        if match:
+            return int(match.group(1)), 0
+        return 0, 0
+
+    def get_key(self, row: list) -> str:
+        """ Sort key of a main table row (lower is processed first). It is text,
+        to be saved and sorted in databases too
+
+        Args:
+            row (list): main table row
+
+        Returns:
+            str: sort key
+        """
+
+        parts = []
+        for key in self.keys:
+            if key == "date":
+                year, number = self.__get_id_date__(row[0])
+                parts.append(self.__encode_desc__(year))
+                parts.append(self.__encode_desc__(number))
+
+            elif key in self.__score_functions__:
+                score = self.__score_functions__[key](row)
+                parts.append(self.__encode_desc__(score or 0))
+
+            else:
+                value = str(row[MAIN_COLUMNS.index(key)] or "").strip().lower()
+                preferred = self.preferences.get(key)
+                if preferred:
+                    rank = preferred.index(value) if value in preferred else len(preferred)
+                    parts.append(f"{rank:04d}")
+                else:
+                    # End mark, to sort short texts first
+                    parts.append(f"{value}\x00")
+
+        return "".join(parts)
+
+    def sort(self, rows: list) -> list:
+        """ Sort rows by priority
+
+        Args:
+            rows (list): main table rows
+
+        Returns:
+            list: rows sorted
+        """
+
+        return sorted(rows, key=self.get_key)
@@ -0,0 +1,208 @@
+import re
+import sqlite3
+
+from libs.columns import DETAILS_COLUMNS, REQUIREMENT_COLUMNS
+from libs.sinks import Sink
+
+
+class SearchIndex (Sink):
+    """ Full text index (sqlite FTS5) of the requirements and the attached
+    files text, updated as a sink while the data is scraped
+    """
+
+    def __init__(self, db_path: str):
+        """ Open (or create) the index database
+
+        Args:
+            db_path (str): path of the sqlite file
+        """
+
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS requirements (
+                id TEXT, num TEXT, key TEXT, description TEXT, details TEXT
+            );
+            CREATE INDEX IF NOT EXISTS requirements_id ON requirements (id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS requirements_fts USING fts5 (
+                key, description, details,
+                content='requirements', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS requirements_insert
+            AFTER INSERT ON requirements BEGIN
+                INSERT INTO requirements_fts (rowid, key, description, details)
+                VALUES (new.rowid, new.key, new.description, new.details);
+            END;
+            CREATE TRIGGER IF NOT EXISTS requirements_delete
+            AFTER DELETE ON requirements BEGIN
+                INSERT INTO requirements_fts
+                    (requirements_fts, rowid, key, description, details)
+                VALUES ('delete', old.rowid, old.key, old.description, old.details);
+            END;
+
+            CREATE TABLE IF NOT EXISTS attachments (
+                id TEXT, file TEXT, text TEXT
+            );
+            CREATE INDEX IF NOT EXISTS attachments_id ON attachments (id, file);
+            CREATE VIRTUAL TABLE IF NOT EXISTS attachments_fts USING fts5 (
+                text,
+                content='attachments', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            );
+            CREATE TRIGGER IF NOT EXISTS attachments_insert
+            AFTER INSERT ON attachments BEGIN
+                INSERT INTO attachments_fts (rowid, text) VALUES (new.rowid, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS attachments_delete
+            AFTER DELETE ON attachments BEGIN
+                INSERT INTO attachments_fts (attachments_fts, rowid, text)
+                VALUES ('delete', old.rowid, old.text);
+            END;
+        """)
+
+    def __replace_requirements__(self, rows: list):
+        """ Replace the indexed requirements of the ids in the rows
+
+        Args:
+            rows (list): matrix with id and requirements columns
+                (num, quantity, part, key, description, details)
+        """
+
+        ids = {row[0] for row in rows}
+        self.connection.executemany(
+            "DELETE FROM requirements WHERE id = ?",
+            [(id,) for id in ids]
+        )
+
+        records = []
+        for id, num, _, _, key, description, details in rows:
+            if not str(num or "").strip() and not str(description or "").strip():
+                continue
+            records.append((id, num, key, description, details))
+
+        self.connection.executemany(
+            "INSERT INTO requirements (id, num, key, description, details)"
+            " VALUES (?, ?, ?, ?, ?)",
+            records
+        )
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        if not rows:
+            return
+
+        if table_name == "details_table":
+            # Take id and requirements columns from wide rows
+            start = DETAILS_COLUMNS.index(REQUIREMENT_COLUMNS[0])
+            end = start + len(REQUIREMENT_COLUMNS)
+            rows = [[row[0]] + list(row[start:end]) for row in rows]
+            self.__replace_requirements__(rows)
+
+        elif table_name == "requirements_table":
+            rows = [list(row[:1 + len(REQUIREMENT_COLUMNS)]) for row in rows]
+            self.__replace_requirements__(rows)
+
+        elif table_name == "attachments_table":
+            for id, _, _, file, _, text in rows:
+                self.connection.execute(
+                    "DELETE FROM attachments WHERE id = ? AND file = ?",
+                    (id, file)
+                )
+                self.connection.execute(
+                    "INSERT INTO attachments (id, file, text) VALUES (?, ?, ?)",
+                    (id, file, text)
+                )
+
+        else:
+            return
+
+        self.connection.commit()
+
+    def close(self):
+
+        self.connection.close()
+
+    def get_match_query(self, query: str) -> str:
+        """ Convert a user query to a FTS5 query: each term (or "quoted text")
+        is searched as a phrase, so keys like 010.000 or names with hyphens
+        are valid. AND, OR, NOT and a * at the end of a term (prefix) are kept
+
+        Args:
+            query (str): user query, like: paracetamol OR ácido-fólico
+
+        Returns:
+            str: FTS5 query
+        """
+
+        terms = []
+        for term in re.findall(r'"[^"]*"?|[^\s"]+', query):
+            if term in ["AND", "OR", "NOT"]:
+                terms.append(term)
+                continue
+
+            prefix = term.endswith("*")
+            text = term.strip('"').rstrip("*").replace('"', '""')
+            if text.strip():
+                terms.append(f'"{text}"' + ("*" if prefix else ""))
+
+        return " ".join(terms)
+
+    def search(self, query: str, limit: int = 50) -> list:
+        """ Search requirements and attached files matching the query
+
+        Args:
+            query (str): search terms, like: paracetamol OR ibuprofeno
+            limit (int, optional): max results of each source. Defaults to 50.
+
+        Returns:
+            list: dicts with id, source ("requirement" or "attachment"),
+                reference (requirement num or file name) and text
+        """
+
+        match_query = self.get_match_query(query)
+        try:
+            return self.__search__(match_query, limit)
+        except sqlite3.OperationalError as error:
+            raise ValueError(f"Invalid search query: {query} ({error})")
+
+    def __search__(self, query: str, limit: int) -> list:
+        """ Run a FTS5 query over requirements and attached files """
+
+        results = []
+
+        cursor = self.connection.execute("""
+            SELECT requirements.id, requirements.num,
+                requirements.description, requirements.details
+            FROM requirements_fts
+            JOIN requirements ON requirements.rowid = requirements_fts.rowid
+            WHERE requirements_fts MATCH ?
+            ORDER BY bm25(requirements_fts)
+            LIMIT ?
+        """, (query, limit))
+        for id, num, description, details in cursor:
+            results.append({
+                "id": id,
+                "source": "requirement",
+                "reference": num,
+                "text": f"{description} {details}".strip(),
+            })
+
+        cursor = self.connection.execute("""
+            SELECT attachments.id, attachments.file,
+                snippet(attachments_fts, 0, '[', ']', '...', 12)
+            FROM attachments_fts
+            JOIN attachments ON attachments.rowid = attachments_fts.rowid
+            WHERE attachments_fts MATCH ?
+            ORDER BY bm25(attachments_fts)
+            LIMIT ?
+        """, (query, limit))
+        for id, file, text in cursor:
+            results.append({
+                "id": id,
+                "source": "attachment",
+                "reference": file,
+                "text": text,
+            })
+
+        return results
@@ -0,0 +1,343 @@
+import os
+import csv
+import json
+import time
+import threading
+
+from libs.columns import TABLE_COLUMNS
+
+
+class Sink ():
+    """ Base output where the scraper writes batches of records
+    """
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+        """ Write a batch of rows in a table
+
+        Args:
+            table_name (str): name of the table
+            rows (list): matrix of data
+            start_row (int, optional): row where positional outputs (like xlsx)
+                start writing. Defaults to 0 (append).
+        """
+
+        raise NotImplementedError
+
+    def write_tables(self, tables: list):
+        """ Write batches of rows in many tables, saved together
+
+        Args:
+            tables (list): tuples (table name, rows), in write order
+        """
+
+        for table_name, rows in tables:
+            self.write(table_name, rows)
+
+    def update(self, table_name: str, rows: list, row_nums: list):
+        """ Overwrite rows already written. Only positional outputs (like xlsx)
+        update them: append only outputs keep the first version of each row,
+        to don't repeat records
+
+        Args:
+            table_name (str): name of the table
+            rows (list): matrix of data
+            row_nums (list): row of each record in positional outputs
+        """
+
+        pass
+
+    def flush(self):
+        """ Save pending data """
+
+        pass
+
+    def close(self):
+        """ Save pending data and release resources """
+
+        self.flush()
+
+
+class XlsxSink (Sink):
+    """ Write records in the sheets of an excel file
+    """
+
+    # Max characters that excel allows in a cell
+    max_cell_length = 32767
+
+    # Tables not saved in excel (attachments text is saved in txt files
+    # and in the other outputs)
+    skip_tables = ["attachments_table"]
+
+    def __init__(self, sheets, start_row: int = 3, save_every: int = 1):
+        """ Save spreadsheet and settings
+
+        Args:
+            sheets (SpreadsheetManager): excel file manager
+            start_row (int, optional): first row with data. Defaults to 3.
+            save_every (int, optional): batches to write before save the file.
+                Defaults to 1.
+        """
+
+        self.sheets = sheets
+        self.start_row = start_row
+        self.save_every = save_every
+        self.__next_rows__ = {}
+        self.__pending__ = 0
+
+    def get_next_row(self, table_name: str) -> int:
+        """ Row where the next batch of the table will be written
+
+        Args:
+            table_name (str): name of the table
+
+        Returns:
+            int: row number
+        """
+
+        if table_name not in self.__next_rows__:
+            max_row = self.sheets.get_sheet(table_name).max_row
+            self.__next_rows__[table_name] = max(max_row + 1, self.start_row)
+
+        return self.__next_rows__[table_name]
+
+    def __write_rows__(self, table_name: str, rows: list, start_row: int = 0):
+        """ Write a batch of rows in a sheet, without save the file """
+
+        if start_row:
+            self.__next_rows__[table_name] = start_row
+        current_row = self.get_next_row(table_name)
+
+        # Cut long texts to the excel limit
+        rows = [
+            [
+                value[:self.max_cell_length] if isinstance(value, str) else value
+                for value in row
+            ]
+            for row in rows
+        ]
+
+        # Write in the sheet of the table (the current sheet can be changed
+        # by the scrapers that read the file)
+        self.sheets.write_data(rows, current_row, sheet_name=table_name)
+        self.__next_rows__[table_name] = current_row + len(rows)
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        if table_name in self.skip_tables:
+            return
+
+        self.__write_rows__(table_name, rows, start_row)
+
+        self.__pending__ += 1
+        if self.__pending__ >= self.save_every:
+            self.flush()
+
+    def write_tables(self, tables: list):
+
+        tables = [table for table in tables if table[0] not in self.skip_tables]
+        if not tables:
+            return
+
+        for table_name, rows in tables:
+            self.__write_rows__(table_name, rows)
+
+        # Save all the tables at once
+        self.__pending__ += 1
+        if self.__pending__ >= self.save_every:
+            self.flush()
+
+    def update(self, table_name: str, rows: list, row_nums: list):
+
+        if not rows or table_name in self.skip_tables:
+            return
+
+        self.get_next_row(table_name)
+        for row, row_num in zip(rows, row_nums):
+            self.sheets.write_data([row], row_num, sheet_name=table_name)
+
+        # Save all the rows at once
+        self.__pending__ += 1
+        if self.__pending__ >= self.save_every:
+            self.flush()
+
+    def flush(self):
+
+        if self.__pending__:
+            self.sheets.save()
+            self.__pending__ = 0
+
+
+class JsonlSink (Sink):
+    """ Append records as json lines, one file per table
+    """
+
+    def __init__(self, folder: str):
+        """ Save settings and create output folder
+
+        Args:
+            folder (str): folder where the files will be saved
+        """
+
+        self.folder = folder
+        self.__files__ = {}
+        os.makedirs(self.folder, exist_ok=True)
+
+    def __get_file__(self, table_name: str):
+        """ Open (once) the file of the table in append mode """
+
+        if table_name not in self.__files__:
+            path = os.path.join(self.folder, f"{table_name}.jsonl")
+            self.__files__[table_name] = open(path, "a", encoding="utf-8")
+        return self.__files__[table_name]
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        columns = TABLE_COLUMNS.get(table_name)
+        file = self.__get_file__(table_name)
+        for row in rows:
+            record = dict(zip(columns, row)) if columns else list(row)
+            file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        file.flush()
+
+    def close(self):
+
+        for file in self.__files__.values():
+            file.close()
+        self.__files__ = {}
+
+
+class CsvSink (Sink):
+    """ Append records as csv rows, one file per table
+    """
+
+    def __init__(self, folder: str):
+        """ Save settings and create output folder
+
+        Args:
+            folder (str): folder where the files will be saved
+        """
+
+        self.folder = folder
+        self.__files__ = {}
+        os.makedirs(self.folder, exist_ok=True)
+
+    def __get_writer__(self, table_name: str):
+        """ Open (once) the file of the table in append mode, adding the
+        header to new files
+        """
+
+        if table_name not in self.__files__:
+            path = os.path.join(self.folder, f"{table_name}.csv")
+            is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+            file = open(path, "a", encoding="utf-8", newline="")
+            writer = csv.writer(file)
+            columns = TABLE_COLUMNS.get(table_name)
+            if is_new and columns:
+                writer.writerow(columns)
+            self.__files__[table_name] = (file, writer)
+        return self.__files__[table_name]
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        file, writer = self.__get_writer__(table_name)
+        writer.writerows(rows)
+        file.flush()
+
+    def close(self):
+
+        for file, _ in self.__files__.values():
+            file.close()
+        self.__files__ = {}
+
+
+class ParquetSink (Sink):
+    """ Write records in partitioned parquet datasets
+    """
+
+    def __init__(self, exporter, flush_rows: int = 10000, flush_interval: int = 300):
+        """ Save exporter and settings
+
+        Args:
+            exporter (ParquetExporter): exporter used to save the records
+            flush_rows (int, optional): buffered rows before save them.
+                Defaults to 10000.
+            flush_interval (int, optional): max seconds to keep rows in the
+                buffer. Defaults to 300.
+        """
+
+        self.exporter = exporter
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.__pending__ = 0
+        self.__last_flush__ = time.time()
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        if table_name not in self.exporter.tables:
+            return
+
+        self.exporter.write_records(table_name, rows)
+        self.__pending__ += len(rows)
+
+        # Save the buffer often, to lose only a few rows if the run crashes
+        elapsed = time.time() - self.__last_flush__
+        if self.__pending__ >= self.flush_rows or elapsed >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+
+        self.exporter.flush()
+        self.__pending__ = 0
+        self.__last_flush__ = time.time()
+
+    def close(self):
+
+        # Rows are saved each time a row group is full, so only the last
+        # (partial) row group is saved here
+        self.exporter.close()
+
+
+class MultiSink (Sink):
+    """ Write the same records in many sinks at once (thread safe, so many
+    scrapers can share it)
+    """
+
+    def __init__(self, sinks: list):
+        """ Save sinks
+
+        Args:
+            sinks (list): Sink instances
+        """
+
+        self.sinks = sinks
+        self.lock = threading.RLock()
+
+    def write(self, table_name: str, rows: list, start_row: int = 0):
+
+        with self.lock:
+            for sink in self.sinks:
+                sink.write(table_name, rows, start_row)
+
+    def write_tables(self, tables: list):
+
+        with self.lock:
+            for sink in self.sinks:
+                sink.write_tables(tables)
+
+    def update(self, table_name: str, rows: list, row_nums: list):
+
+        with self.lock:
+            for sink in self.sinks:
+                sink.update(table_name, rows, row_nums)
+
+    def flush(self):
+
+        with self.lock:
+            for sink in self.sinks:
+                sink.flush()
+
+    def close(self):
+
+        with self.lock:
+            for sink in self.sinks:
+                sink.close()
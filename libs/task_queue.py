@@ -0,0 +1,271 @@
+import json
+import time
+import sqlite3
+import threading
+
+
+class TaskQueue ():
+    """ Queue of procedure ids shared by many scrapers (in the same or in other
+    machines, with the database in shared storage). Each claimed task has a
+    lease: if the worker doesn't finish or renew it in time, the task can be
+    claimed again by other worker
+    """
+
+    def __init__(self, db_path: str, lease_time: int = 900, max_attempts: int = 5):
+        """ Open (or create) the queue database
+
+        Args:
+            db_path (str): path of the sqlite file
+            lease_time (int, optional): seconds before a claimed task expires.
+                Defaults to 900.
+            max_attempts (int, optional): claims allowed before mark a task as
+                failed. Defaults to 5.
+        """
+
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+
+        # Autocommit mode: transactions are opened manually to lock the
+        # database while a task is claimed
+        self.connection = sqlite3.connect(
+            db_path,
+            timeout=60,
+            isolation_level=None,
+            check_same_thread=False
+        )
+        self.lock = threading.Lock()
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                stage TEXT,
+                id TEXT,
+                payload TEXT,
+                status TEXT DEFAULT 'pending',
+                owner TEXT,
+                lease_until REAL DEFAULT 0,
+                attempts INTEGER DEFAULT 0,
+                error TEXT,
+                priority TEXT DEFAULT '',
+                PRIMARY KEY (stage, id)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_status ON tasks (stage, status);
+        """)
+
+        # Add priority to the queues created before it existed
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(tasks)")]
+        if "priority" not in columns:
+            self.connection.execute("ALTER TABLE tasks ADD COLUMN priority TEXT DEFAULT ''")
+
+    def add_tasks(self, stage: str, rows: list, priorities: list = None) -> int:
+        """ Add rows to the queue of a stage (ids already added are skipped)
+
+        Args:
+            stage (str): name of the stage, like "details" or "downloads"
+            rows (list): main table rows, with the id in the first column
+            priorities (list, optional): sort key of each row (lower keys are
+                claimed first). Defaults to None (claimed in added order).
+
+        Returns:
+            int: number of new tasks
+        """
+
+        priorities = priorities or [""] * len(rows)
+        records = [
+            (stage, row[0], json.dumps(list(row)), priority)
+            for row, priority in zip(rows, priorities) if row[0]
+        ]
+        with self.lock:
+            total_changes = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO tasks (stage, id, payload, priority)"
+                " VALUES (?, ?, ?, ?)",
+                records
+            )
+            return self.connection.total_changes - total_changes
+
+    def claim(self, stage: str, owner: str) -> list:
+        """ Lease the next pending (or expired) task of a stage
+
+        Args:
+            stage (str): name of the stage
+            owner (str): id of the worker
+
+        Returns:
+            list: main table row of the task, or None if there are no tasks
+        """
+
+        now = time.time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Fail the expired tasks without attempts left
+                self.connection.execute("""
+                    UPDATE tasks
+                    SET status = 'failed', owner = NULL, lease_until = 0,
+                        error = 'Lease expired after ' || attempts || ' attempts'
+                    WHERE stage = ? AND status = 'leased' AND lease_until < ?
+                        AND attempts >= ?
+                """, (stage, now, self.max_attempts))
+
+                task = self.connection.execute("""
+                    SELECT id, payload FROM tasks
+                    WHERE stage = ? AND attempts < ? AND (
+                        status = 'pending'
+                        OR (status = 'leased' AND lease_until < ?)
+                    )
+                    ORDER BY priority, rowid
+                    LIMIT 1
+                """, (stage, self.max_attempts, now)).fetchone()
+
+                if not task:
+                    self.connection.execute("COMMIT")
+                    return None
+
+                self.connection.execute("""
+                    UPDATE tasks
+                    SET status = 'leased', owner = ?, lease_until = ?,
+                        attempts = attempts + 1
+                    WHERE stage = ? AND id = ?
+                """, (owner, now + self.lease_time, stage, task[0]))
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return json.loads(task[1])
+
+    def __update_owned__(self, query: str, params: tuple) -> bool:
+        """ Run an update over a task leased by a worker
+
+        Returns:
+            bool: True if the worker still owned the task
+        """
+
+        with self.lock:
+            cursor = self.connection.execute(query, params)
+            return cursor.rowcount == 1
+
+    def renew(self, stage: str, id: str, owner: str) -> bool:
+        """ Extend the lease of a task
+
+        Args:
+            stage (str): name of the stage
+            id (str): procedure id
+            owner (str): id of the worker
+
+        Returns:
+            bool: True if the worker still owns the task
+        """
+
+        return self.__update_owned__("""
+            UPDATE tasks SET lease_until = ?
+            WHERE stage = ? AND id = ? AND owner = ? AND status = 'leased'
+        """, (time.time() + self.lease_time, stage, id, owner))
+
+    def complete(self, stage: str, id: str, owner: str) -> bool:
+        """ Mark a task as done
+
+        Args:
+            stage (str): name of the stage
+            id (str): procedure id
+            owner (str): id of the worker
+
+        Returns:
+            bool: True if the worker still owned the task
+        """
+
+        return self.__update_owned__("""
+            UPDATE tasks SET status = 'done', error = NULL
+            WHERE stage = ? AND id = ? AND owner = ? AND status = 'leased'
+        """, (stage, id, owner))
+
+    def fail(self, stage: str, id: str, owner: str, error: str) -> bool:
+        """ Return a task to the queue, or mark it as failed after
+        max_attempts claims
+
+        Args:
+            stage (str): name of the stage
+            id (str): procedure id
+            owner (str): id of the worker
+            error (str): error message
+
+        Returns:
+            bool: True if the worker still owned the task
+        """
+
+        return self.__update_owned__("""
+            UPDATE tasks
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                owner = NULL, lease_until = 0, error = ?
+            WHERE stage = ? AND id = ? AND owner = ? AND status = 'leased'
+        """, (self.max_attempts, error, stage, id, owner))
+
+    def has_active_leases(self, stage: str) -> bool:
+        """ Check if other workers are processing tasks of a stage (tasks
+        that can return to the queue if they fail)
+
+        Args:
+            stage (str): name of the stage
+
+        Returns:
+            bool: True if there are leased tasks not expired
+        """
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT COUNT(*) FROM tasks"
+                " WHERE stage = ? AND status = 'leased' AND lease_until >= ?",
+                (stage, time.time())
+            )
+            return cursor.fetchone()[0] > 0
+
+    def get_counts(self, stage: str) -> dict:
+        """ Number of tasks of a stage by status
+
+        Args:
+            stage (str): name of the stage
+
+        Returns:
+            dict: tasks number by status (pending, leased, done, failed)
+        """
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "SELECT status, COUNT(*) FROM tasks WHERE stage = ? GROUP BY status",
+                (stage,)
+            )
+            return dict(cursor.fetchall())
+
+
+class LeaseRenewer (threading.Thread):
+    """ Renew the lease of a task while it is processed
+    """
+
+    def __init__(self, task_queue: TaskQueue, stage: str, id: str, owner: str):
+        """ Save task data
+
+        Args:
+            task_queue (TaskQueue): queue of the task
+            stage (str): name of the stage
+            id (str): procedure id
+            owner (str): id of the worker
+        """
+
+        super().__init__(daemon=True)
+        self.task_queue = task_queue
+        self.stage = stage
+        self.id = id
+        self.owner = owner
+        self.lost = False
+        self.__stop_event__ = threading.Event()
+
+    def run(self):
+
+        while not self.__stop_event__.wait(self.task_queue.lease_time / 3):
+            if not self.task_queue.renew(self.stage, self.id, self.owner):
+                self.lost = True
+                break
+
+    def stop(self):
+        """ Stop renewing the lease """
+
+        self.__stop_event__.set()
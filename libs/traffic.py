@@ -0,0 +1,130 @@
+import os
+import time
+import atexit
+import socket
+import subprocess
+import threading
+
+
+class TrafficProxy ():
+    """ Local mitmproxy (mitmdump) process between the browsers and the portal,
+    that records all the traffic in an archive, or replays the recorded
+    responses offline
+    """
+
+    modes = ["record", "replay"]
+
+    def __init__(self, mode: str, archive_path: str, port: int = 8080,
+                 mitmdump_path: str = "mitmdump"):
+        """ Save settings
+
+        Args:
+            mode (str): "record" (save the traffic) or "replay" (serve the
+                saved responses, without network)
+            archive_path (str): path of the mitmproxy flows file
+            port (int, optional): local port of the proxy. Defaults to 8080.
+            mitmdump_path (str, optional): mitmdump executable.
+                Defaults to "mitmdump".
+        """
+
+        if mode not in self.modes:
+            raise ValueError(f"Invalid traffic mode: {mode}")
+
+        self.mode = mode
+        self.archive_path = archive_path
+        self.host = "127.0.0.1"
+        self.port = port
+        self.mitmdump_path = mitmdump_path
+        self.process = None
+        self.__lock__ = threading.Lock()
+
+    def get_command(self) -> list:
+        """ Command line of mitmdump for the current mode
+
+        Returns:
+            list: command and arguments
+        """
+
+        command = [
+            self.mitmdump_path,
+            "--quiet",
+            "--listen-host", self.host,
+            "--listen-port", str(self.port),
+        ]
+
+        if self.mode == "record":
+            # Append ("+" prefix) to keep the traffic of previous runs
+            command += ["--save-stream-file", f"+{self.archive_path}"]
+        else:
+            # Reuse responses (pages are loaded many times) and block the
+            # requests not recorded, to don't use the network
+            command += [
+                "--server-replay", self.archive_path,
+                "--set", "server_replay_reuse=true",
+                "--set", "server_replay_extra=kill",
+            ]
+
+        return command
+
+    def start(self, time_out: int = 30):
+        """ Start the proxy (only once) and wait until it accepts connections
+
+        Args:
+            time_out (int, optional): seconds to wait. Defaults to 30.
+        """
+
+        with self.__lock__:
+            if self.process:
+                return
+
+            if self.mode == "replay" and not os.path.exists(self.archive_path):
+                raise FileNotFoundError(f"Traffic archive not found: {self.archive_path}")
+
+            try:
+                self.process = subprocess.Popen(
+                    self.get_command(),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"{self.mitmdump_path} not found (install mitmproxy)"
+                )
+            atexit.register(self.stop)
+
+            # Wait until the port is open
+            end_time = time.time() + time_out
+            while time.time() < end_time:
+                if self.process.poll() is not None:
+                    raise Exception("Traffic proxy stopped on start")
+                try:
+                    socket.create_connection((self.host, self.port), timeout=1).close()
+                    print(f"Traffic proxy in {self.mode} mode: {self.archive_path}")
+                    return
+                except OSError:
+                    time.sleep(0.5)
+
+            raise Exception(f"Traffic proxy not started in {time_out} seconds")
+
+    def get_proxy(self) -> dict:
+        """ Proxy data for the browsers
+
+        Returns:
+            dict: server and port of the local proxy
+        """
+
+        return {"server": self.host, "port": str(self.port)}
+
+    def stop(self):
+        """ Stop the proxy (saving the recorded traffic) """
+
+        with self.__lock__:
+            if not self.process:
+                return
+
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
@@ -0,0 +1,65 @@
+import time
+import threading
+from contextlib import contextmanager
+
+from libs.progress import log
+
+
+class BrowserWatchdog (threading.Thread):
+    """ Kill the browser of a scraper when it stops sending heartbeats,
+    so the blocked action raises an error and the scraper can restart it
+    """
+
+    def __init__(self, scraper, time_out: int = 600, check_every: int = 10):
+        """ Save settings
+
+        Args:
+            scraper (WebScraping): scraper to watch
+            time_out (int, optional): seconds without heartbeat before kill
+                the browser. Defaults to 600.
+            check_every (int, optional): seconds between checks. Defaults to 10.
+        """
+
+        super().__init__(daemon=True)
+        self.scraper = scraper
+        self.time_out = time_out
+        self.check_every = check_every
+        self.stalls = 0
+        self.__idle__ = 0
+        self.__stop_event__ = threading.Event()
+
+    @contextmanager
+    def idle(self):
+        """ Don't watch the browser while the scraper waits for work (like
+        ids from a queue or a free worker slot), without using the browser
+        """
+
+        self.__idle__ += 1
+        try:
+            yield
+        finally:
+            self.__idle__ -= 1
+            self.scraper.heartbeat()
+
+    def run(self):
+
+        while not self.__stop_event__.wait(self.check_every):
+            if self.__idle__:
+                continue
+
+            inactive_time = time.time() - self.scraper.last_heartbeat
+            if inactive_time < self.time_out:
+                continue
+
+            self.stalls += 1
+            log(f"\t\tBrowser without activity for {int(inactive_time)} seconds."
+                " Killing it...")
+            self.scraper.kill_browser()
+
+            # Give time to the scraper to restart the browser
+            self.scraper.heartbeat()
+
+    def stop(self):
+        """ Stop watching the browser """
+
+        self.__stop_event__.set()
@@ -1,12 +1,21 @@
 import os
+import copy
+import json
 import time
+import shutil
+import hashlib
 import zipfile
+import tempfile
+import psutil
+from urllib.parse import urlparse
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import NoSuchElementException
+from libs.retry import RetryPolicy
 
 current_file = os.path.basename(__file__)
 
@@ -15,7 +24,6 @@ class WebScraping ():
     """ Class to manage and configure web browser
     """
     
-    service = None
     options = None
 
     def __init__(self, headless: bool = False, time_out: int = 0,
@@ -26,7 +34,8 @@ class WebScraping ():
                  incognito: bool = False, experimentals: bool = True,
                  start_killing: bool = False, start_openning: bool = True,
                  width: int = 1280, height: int = 720,
-                 mute: bool = True):
+                 mute: bool = True, chrome_template: str = "",
+                 retry_policy: RetryPolicy = None, ignore_certificates: bool = False):
         
         """ Save settings and create a new instance of the web browser
 
@@ -48,6 +57,13 @@ class WebScraping ():
             width (int, optional): Width of the window. Defaults to 1280.
             height (int, optional): Height of the window. Defaults to 720.
             mute (bool, optional): Mute the audio of the window. Defaults to True.
+            chrome_template (str, optional): folder with a prepared chrome user data
+                (warm cache), copied to a temp folder for each browser. Defaults to "".
+            retry_policy (RetryPolicy, optional): retries of the page actions
+                (set_page, click_js, send_data, get_elem, get_text).
+                Defaults to None (no retries).
+            ignore_certificates (bool, optional): Accept invalid certificates
+                (like the ones of a local recording proxy). Defaults to False.
         """
 
         self.basetime = 1
@@ -61,6 +77,8 @@ class WebScraping ():
         self.__proxy_pass__ = proxy_pass
         self.__pluginfile__ = os.path.join(self.current_folder, 'proxy_auth_plugin.zip')
         self.__chrome_folder__ = chrome_folder
+        self.__chrome_template__ = chrome_template
+        self.__chrome_clone__ = ""
         self.__user_agent__ = user_agent
         self.__download_folder__ = download_folder
         self.__extensions__ = extensions
@@ -70,8 +88,12 @@ class WebScraping ():
         self.__width__ = width
         self.__height__ = height
         self.__mute__ = mute
+        self.retry_policy = retry_policy or RetryPolicy(retries=0)
+        self.__ignore_certificates__ = ignore_certificates
         
         self.__web_page__ = None
+        self.last_heartbeat = time.time()
+        self.last_session = None
 
         # Kill chrome from terminal
         if start_killing:
@@ -177,11 +199,6 @@ class WebScraping ():
             if self.__mute__:
                 WebScraping.options.add_argument("--mute-audio")
                 
-            # Set chrome folder
-            if self.__chrome_folder__:
-                chrome_folder_option = f"--user-data-dir={self.__chrome_folder__}"
-                WebScraping.options.add_argument(chrome_folder_option)
-
             # Set default user agent
             if self.__user_agent__:
                 WebScraping.options.add_argument(f'--user-agent={self.__user_agent__}')
@@ -218,34 +235,107 @@ class WebScraping ():
                     "--disable-blink-features=AutomationControlled"
                 )
         
+        # Copy shared options, to add the settings of this instance
+        options = copy.deepcopy(WebScraping.options)
+        
+        # Set chrome folder (a new copy of the template, if there is one)
+        chrome_folder = self.__chrome_folder__
+        if self.__chrome_template__:
+            chrome_folder = self.__clone_chrome_template__()
+        if chrome_folder:
+            options.add_argument(f"--user-data-dir={chrome_folder}")
+        
+        if self.__ignore_certificates__:
+            options.add_argument("--ignore-certificate-errors")
+        
         # Setup proxy
         if self.__proxy_server__ and self.__proxy_port__:
             
             # Setup user and password proxy
             if self.__proxy_user__ and self.__proxy_pass__:
                 self.__create_proxy_extension__()
-                WebScraping.options.add_extension(self.__pluginfile__)
+                options.add_extension(self.__pluginfile__)
+                if '--disable-extensions' in options.arguments:
+                    options.arguments.remove('--disable-extensions')
                 
             # Setup basic proxy
             else:
                 proxy = f"{self.__proxy_server__}:{self.__proxy_port__}"
-                WebScraping.options.add_argument(f"--proxy-server={proxy}")
+                options.add_argument(f"--proxy-server={proxy}")
 
-        # Autoinstall driver with selenium
-        if not WebScraping.service:
-            WebScraping.service = Service()
+        # Autoinstall driver with selenium (one service for each browser)
+        self.service = Service()
           
         # Auto download driver
         self.driver = webdriver.Chrome(
-            service=WebScraping.service,
-            options=WebScraping.options
+            service=self.service,
+            options=options
         )
 
-    def __create_proxy_extesion__(self):
-        """ Create a proxy chrome extension """
+    def __clone_chrome_template__(self) -> str:
+        """ Copy the chrome template folder to a new temp folder (deleting
+        the copy of the previous browser)
+
+        Returns:
+            str: path of the new chrome folder
+        """
+
+        self.__remove_chrome_clone__()
+
+        # Skip files of the running browser that prepared the template
+        ignore = shutil.ignore_patterns(
+            "Singleton*", "lockfile", "LOCK", "Crashpad", "*.tmp"
+        )
+        temp_folder = tempfile.mkdtemp(prefix="chrome-profile-")
+        self.__chrome_clone__ = os.path.join(temp_folder, "profile")
+        shutil.copytree(self.__chrome_template__, self.__chrome_clone__,
+                        symlinks=True, ignore=ignore)
+
+        return self.__chrome_clone__
+
+    def __remove_chrome_clone__(self):
+        """ Delete the temp copy of the chrome template, if exists """
+
+        if self.__chrome_clone__:
+            shutil.rmtree(os.path.dirname(self.__chrome_clone__), ignore_errors=True)
+            self.__chrome_clone__ = ""
+
+    def set_proxy(self, proxy_server: str, proxy_port: str,
+                  proxy_user: str = "", proxy_pass: str = ""):
+        """ Change the proxy, used the next time the browser starts
+
+        Args:
+            proxy_server (str): Proxy server or host to use
+            proxy_port (str): Proxy post to use in the window
+            proxy_user (str, optional): Proxy user. Defaults to "".
+            proxy_pass (str, optional): Proxy password. Defaults to "".
+        """
+
+        self.__proxy_server__ = proxy_server
+        self.__proxy_port__ = proxy_port
+        self.__proxy_user__ = proxy_user
+        self.__proxy_pass__ = proxy_pass
+
+    def __create_proxy_extension__(self):
+        """ Create a proxy chrome extension (once for each proxy credentials) """
+
+        # Reuse the extension of the same proxy
+        proxy_data = ":".join([
+            self.__proxy_server__, str(self.__proxy_port__),
+            self.__proxy_user__, self.__proxy_pass__
+        ])
+        proxy_hash = hashlib.sha1(proxy_data.encode()).hexdigest()[:12]
+
+        # Saved out of the project (the extension has the proxy credentials)
+        extensions_folder = os.path.join(tempfile.gettempdir(), "proxy-extensions")
+        os.makedirs(extensions_folder, exist_ok=True)
+        self.__pluginfile__ = os.path.join(
+            extensions_folder, f'proxy_auth_plugin_{proxy_hash}.zip')
+        if os.path.exists(self.__pluginfile__):
+            return
 
         # plugin data
-        manifest_json = f"""
+        manifest_json = """
         {
             "version": "1.0.0",
             "manifest_version": 2,
@@ -298,10 +388,12 @@ class WebScraping ():
         """ % (self.__proxy_server__, self.__proxy_port__,
                self.__proxy_user__, self.__proxy_pass__)
 
-        # Compress file
-        with zipfile.ZipFile(self.__pluginfile__, 'w') as zp:
+        # Compress file (with temp name, to don't share incomplete files)
+        temp_file = f"{self.__pluginfile__}.{os.getpid()}.tmp"
+        with zipfile.ZipFile(temp_file, 'w') as zp:
             zp.writestr("manifest.json", manifest_json)
             zp.writestr("background.js", background_js)
+        os.replace(temp_file, self.__pluginfile__)
 
     def screenshot(self, base_name: str):
         """ Take a sreenshot of the current browser window
@@ -348,16 +440,225 @@ class WebScraping ():
         """ End current instance of web browser
         """
 
-        self.driver.quit()
+        try:
+            self.driver.quit()
+        finally:
+            self.__remove_chrome_clone__()
 
     def __reload_browser__(self):
         """ Close the current instance of the web browser and reload in the same page
         """
 
         self.end_browser()
-        self.driver = self.get_browser()
+        self.__set_browser_instance__()
         self.driver.get(self.__web_page__)
 
+    def heartbeat(self):
+        """ Register that the browser is still working (used by watchdogs)
+        """
+
+        self.last_heartbeat = time.time()
+
+    def __get_driver_processes__(self) -> list:
+        """ Return the chromedriver process and all its children (browser,
+        renderers, gpu, etc)
+
+        Returns:
+            list: psutil processes
+        """
+
+        try:
+            driver_process = psutil.Process(self.driver.service.process.pid)
+            return [driver_process] + driver_process.children(recursive=True)
+        except Exception:
+            return []
+
+    def get_memory_usage(self) -> float:
+        """ Return the memory (RSS) used by the driver and browser processes
+
+        Returns:
+            float: memory in MB
+        """
+
+        memory = 0
+        for process in self.__get_driver_processes__():
+            try:
+                memory += process.memory_info().rss
+            except psutil.Error:
+                continue
+
+        return memory / 1024 / 1024
+
+    def kill_browser(self):
+        """ Force close the current browser and its driver, even if they are hung
+        """
+
+        for process in reversed(self.__get_driver_processes__()):
+            try:
+                process.kill()
+            except psutil.Error:
+                continue
+
+    def recycle_browser(self):
+        """ Close the browser (to release its memory) and open a new one
+        in the same page, with the same cookies and local storage
+        """
+
+        # Save session
+        session = self.get_session()
+
+        # Open new browser
+        try:
+            self.end_browser()
+        except Exception:
+            self.kill_browser()
+        self.__set_browser_instance__()
+        self.heartbeat()
+
+        # Restore session
+        self.set_session(session)
+
+    def restart_browser(self):
+        """ Kill the current browser and open a new one in the last page
+        (with the last session saved, if there is one)
+        """
+
+        self.kill_browser()
+        self.__set_browser_instance__()
+        self.heartbeat()
+
+        if self.last_session:
+            self.set_session(self.last_session)
+        elif self.__web_page__:
+            self.set_page(self.__web_page__)
+
+    def get_session(self) -> dict:
+        """ Snapshot of the browser session: current page, cookies,
+        local storage and session storage
+
+        Returns:
+            dict: session data
+        """
+
+        self.last_session = {
+            "url": self.driver.current_url,
+            "cookies": self.driver.get_cookies(),
+            "local_storage": self.get_local_storage(),
+            "session_storage": self.get_session_storage(),
+        }
+        return self.last_session
+
+    def set_session(self, session: dict):
+        """ Restore a session snapshot and open its page (loading it once:
+        cookies and storage are set with the devtools protocol before the
+        page starts)
+
+        Args:
+            session (dict): session data from get_session
+        """
+
+        self.last_session = session
+
+        # Cookies of any domain, without open a page
+        for cookie in session.get("cookies", []):
+            cdp_cookie = {
+                key: cookie[key]
+                for key in ["name", "value", "domain", "path", "secure",
+                            "httpOnly", "sameSite"]
+                if key in cookie
+            }
+            if "expiry" in cookie:
+                cdp_cookie["expires"] = cookie["expiry"]
+            self.driver.execute_cdp_cmd("Network.setCookie", cdp_cookie)
+
+        # Storage values, set in the page origin before its scripts run
+        url = urlparse(session["url"])
+        script = """
+            if (location.origin === %s) {
+                for (const [key, value] of Object.entries(%s)) {
+                    window.localStorage.setItem(key, value)
+                }
+                for (const [key, value] of Object.entries(%s)) {
+                    window.sessionStorage.setItem(key, value)
+                }
+            }
+        """ % (
+            json.dumps(f"{url.scheme}://{url.netloc}"),
+            json.dumps(session.get("local_storage", {})),
+            json.dumps(session.get("session_storage", {})),
+        )
+        storage_script = self.driver.execute_cdp_cmd(
+            "Page.addScriptToEvaluateOnNewDocument", {"source": script}
+        )
+
+        try:
+            self.set_page(session["url"])
+        finally:
+            self.driver.execute_cdp_cmd(
+                "Page.removeScriptToEvaluateOnNewDocument",
+                {"identifier": storage_script["identifier"]}
+            )
+
+    def save_session(self, path: str, extra: dict = {}):
+        """ Save a snapshot of the session in a json file
+
+        Args:
+            path (str): path of the json file
+            extra (dict, optional): other data to save with the session
+                (like the filters applied). Defaults to {}.
+        """
+
+        data = dict(extra)
+        data["session"] = self.get_session()
+        data["saved"] = time.time()
+
+        # Write a temp file and replace the old one at once
+        temp_path = f"{path}.{os.getpid()}.{id(self)}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def load_session(self, path: str, max_age: int = 0) -> dict:
+        """ Restore the session saved in a json file
+
+        Args:
+            path (str): path of the json file
+            max_age (int, optional): max seconds since the session was saved.
+                Defaults to 0 (no limit).
+
+        Returns:
+            dict: data saved with the session, or None if there is no
+                valid session
+        """
+
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if max_age and time.time() - data.get("saved", 0) > max_age:
+            return None
+
+        self.set_session(data["session"])
+        return data
+
+    def __run_action__(self, action, *args):
+        """ Run a page action with the retry policy
+        
+        Args:
+            action (callable): function to run
+            *args: arguments of the function
+            
+        Returns:
+            any: result of the action
+        """
+        
+        return self.retry_policy.run(action, *args)
+
     def send_data(self, selector: str, data: str):
         """ Send data to specific input fill
         
@@ -366,8 +667,11 @@ class WebScraping ():
             data (str): data to send to the input
         """
 
-        elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-        elem.send_keys(data)
+        def send():
+            elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+            elem.send_keys(data)
+        
+        self.__run_action__(send)
 
     def click(self, selector: str):
         """ Send click to specific element in the page
@@ -434,22 +738,28 @@ class WebScraping ():
                 error = f"Time out exeded. The element {selector} is until in the page"
                 raise Exception(error)
 
-    def get_text(self, selector: str) -> str:
+    def get_text(self, selector: str, required: bool = False) -> str:
         """ Return text for specific element in the page
         
         Args:
             selector (str): CSS selector of the element
+            required (bool, optional): retry while the element is not in the
+                page, and raise the error after the retries. Defaults to False.
             
         Returns:
-            str: text of the element
+            str: text of the element, or "" if the element is not in the page
         """
 
-        try:
-            elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+        def get():
+            try:
+                elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+            except NoSuchElementException:
+                if required:
+                    raise
+                return ""
             return elem.text
-        except Exception:
-            # print (err)
-            return ""
+        
+        return self.__run_action__(get)
 
     def get_texts(self, selector: str) -> list:
         """ Return a list of text for specific selector
@@ -550,7 +860,7 @@ class WebScraping ():
             WebElement: element in the page
         """
 
-        elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+        elem = self.__run_action__(self.driver.find_element, By.CSS_SELECTOR, selector)
         return elem
 
     def get_elems(self, selector: str) -> list:
@@ -602,9 +912,9 @@ class WebScraping ():
             if time_out > 0:
                 self.driver.set_page_load_timeout(time_out)
 
-            self.driver.get(self.__web_page__)
+            self.__run_action__(self.driver.get, self.__web_page__)
 
-        # Catch error in load page
+        # Catch error in load page (after retries)
         except Exception:
 
             # Raise error
@@ -622,8 +932,11 @@ class WebScraping ():
             selector (str): CSS selector of the element
         """
         
-        elem = self.driver.find_element(By.CSS_SELECTOR, selector)
-        self.driver.execute_script("arguments[0].click();", elem)
+        def click():
+            elem = self.driver.find_element(By.CSS_SELECTOR, selector)
+            self.driver.execute_script("arguments[0].click();", elem)
+        
+        self.__run_action__(click)
 
     def select_drop_down_index(self, selector: str, index: int):
         """ Select specific elemet (with number) in a drop down elemet
@@ -801,5 +1114,42 @@ class WebScraping ():
             value (str): local storage value
         """
         
-        script = f"window.localStorage.setItem('{key}', '{value}')"
-        self.driver.execute_script(script)
\ No newline at end of file
+        script = "window.localStorage.setItem(arguments[0], arguments[1])"
+        self.driver.execute_script(script, key, value)
+
+    def set_session_storage(self, key: str, value: str):
+        """ Set a value in session storage with js
+
+        Args:
+            key (str): session storage key
+            value (str): session storage value
+        """
+        
+        script = "window.sessionStorage.setItem(arguments[0], arguments[1])"
+        self.driver.execute_script(script, key, value)
+
+    def get_session_storage(self) -> dict:
+        """ Return all the values in session storage
+
+        Returns:
+            dict: session storage keys and values
+        """
+
+        script = "return JSON.stringify(Object.assign({}, window.sessionStorage))"
+        try:
+            return json.loads(self.driver.execute_script(script))
+        except Exception:
+            return {}
+
+    def get_local_storage(self) -> dict:
+        """ Return all the values in local storage
+
+        Returns:
+            dict: local storage keys and values
+        """
+
+        script = "return JSON.stringify(Object.assign({}, window.localStorage))"
+        try:
+            return json.loads(self.driver.execute_script(script))
+        except Exception:
+            return {}
\ No newline at end of file
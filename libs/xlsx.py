@@ -56,6 +56,20 @@ class SpreadsheetManager ():
             self.wb.create_sheet(sheet_name)
             self.set_sheet(sheet_name)
 
+    def get_sheet(self, sheet_name: str):
+        """ Get a sheet (created if not exists) without change the current sheet
+
+        Args:
+            sheet_name (str): Name of the sheet
+
+        Returns:
+            Worksheet: sheet of the workbook
+        """
+
+        if sheet_name not in self.get_sheets():
+            self.wb.create_sheet(sheet_name)
+        return self.wb[sheet_name]
+
     def set_sheet(self, sheet_name: str):
         """ Set a specific sheet as current sheet
 
@@ -82,15 +96,18 @@ class SpreadsheetManager ():
 
         self.current_sheet.cell(row, column).value = value
 
-    def write_data(self, data: list = [], start_row: int = 1, start_column: int = 1):
-        """ Write a matrix of data in the current sheet
+    def write_data(self, data: list = [], start_row: int = 1, start_column: int = 1,
+                   sheet_name: str = ""):
+        """ Write a matrix of data in the current sheet (or in other sheet)
 
         Args:
             data (list, optional): Matrix of data. Defaults to [].
             start_row (int, optional): Row number to start writing. Defaults to 1.
             start_column (int, optional): Column number to start writing. Defaults to 1.
+            sheet_name (str, optional): Sheet to write. Defaults to "" (current sheet).
         """
 
+        sheet = self.get_sheet(sheet_name) if sheet_name else self.current_sheet
         current_row = start_row
         current_column = start_column
 
@@ -98,7 +115,7 @@ class SpreadsheetManager ():
 
             for cell_value in row:
 
-                cell_obj = self.current_sheet.cell(current_row, current_column)
+                cell_obj = sheet.cell(current_row, current_column)
                 cell_obj.value = cell_value
 
                 current_column += 1
@@ -153,20 +170,15 @@ class SpreadsheetManager ():
             current_column = 1
             current_row += 1
 
-    def get_data(self):
-        """ Get all data from the current page """
+    def get_data(self, start_row: int = 1):
+        """ Get all data from the current page
 
-        rows = self.current_sheet.max_row
-        columns = self.current_sheet.max_column
+        Args:
+            start_row (int, optional): Row number to start reading. Defaults to 1.
+        """
 
         data = []
-        for row in range(1, rows + 1):
-
-            row_data = []
-            for column in range(1, columns + 1):
-                cell_data = self.current_sheet.cell(row, column).value
-                row_data.append(cell_data)
-
-            data.append(row_data)
+        for row in self.current_sheet.iter_rows(min_row=start_row, values_only=True):
+            data.append(list(row))
 
         return data